@@ -0,0 +1,75 @@
+"""Per-certificate render latency and size: file-path template vs cached
+template vs cached optimized (JPEG) template, each drawn with a reportlab
+canvas, vs the precompiled PDF that only splices in the text.
+
+Usage:
+    python benchmarks/bench_certificate_render.py [iterations]
+"""
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+from certificate_generator import CertificateGenerator
+
+TEMPLATE_DIR = os.path.join(BASE_DIR, 'data', 'templates')
+
+SAMPLE_STUDENT = {
+    'student_name': 'Rahul Sharma',
+    'batch_number': 'AWS-2024-001',
+    'batch_start_date': '2024-01-15',
+    'batch_end_date': '2024-04-15',
+    'sixerclass_id': 'SIX001'
+}
+
+
+class CanvasCertificateGenerator(CertificateGenerator):
+    """Draw every certificate with a reportlab canvas"""
+
+    def _render_compiled(self, student_data, issue_date=None):
+        return None
+
+
+class UncachedCertificateGenerator(CanvasCertificateGenerator):
+    """Previous behaviour: hand reportlab the file path on every render"""
+
+    def _draw_template(self, c, width, height):
+        c.drawImage(self.template_path, 0, 0, width=width, height=height)
+
+
+def bench(generator, iterations, output_dir):
+    output_path = os.path.join(output_dir, 'bench.pdf')
+    generator.create_certificate(SAMPLE_STUDENT, output_path)  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        generator.create_certificate(SAMPLE_STUDENT, output_path)
+    file_ms = (time.perf_counter() - start) / iterations * 1000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        generator.render_certificate(SAMPLE_STUDENT)
+    memory_ms = (time.perf_counter() - start) / iterations * 1000
+    return file_ms, memory_ms, os.path.getsize(output_path)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = [
+            ('file path', bench(UncachedCertificateGenerator(TEMPLATE_DIR), iterations, output_dir)),
+            ('cached template', bench(CanvasCertificateGenerator(TEMPLATE_DIR), iterations, output_dir)),
+            ('optimized template q85', bench(CanvasCertificateGenerator(TEMPLATE_DIR, optimize=True), iterations, output_dir)),
+            ('precompiled', bench(CertificateGenerator(TEMPLATE_DIR), iterations, output_dir)),
+            ('precompiled q85', bench(CertificateGenerator(TEMPLATE_DIR, optimize=True), iterations, output_dir)),
+        ]
+
+    print()
+    print(f"{'renderer':<26}{'ms to file':>12}{'ms in memory':>14}{'PDF bytes':>14}")
+    for label, (file_ms, memory_ms, size) in results:
+        print(f"{label:<26}{file_ms:>12.2f}{memory_ms:>14.2f}{size:>14,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Peak RSS and wall time of full vs streaming (read-only/write-only) Excel I/O.
+
+Each case runs in a fresh interpreter so peak RSS is not polluted by the
+previous one.
+
+Usage:
+    python benchmarks/bench_excel_io.py [rows ...]      # default: 10000 100000 500000
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'src'))
+
+HEADERS = ['student_name', 'batch_number', 'batch_start_date', 'batch_end_date', 'sixerclass_id']
+CASES = ['write-full', 'write-stream', 'read-full', 'read-stream']
+
+
+def student_rows(count):
+    for i in range(count):
+        yield [f'Student {i}', f'AWS-2024-{i % 500:03d}', '2024-01-15', '2024-04-15', f'SIX{i:06d}']
+
+
+def run_case(case, rows, path):
+    import openpyxl
+    from excel_io import read_sheet, write_sheet
+
+    if case == 'write-full':
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.append(HEADERS)
+        for row in student_rows(rows):
+            ws.append(row)
+        wb.save(path)
+    elif case == 'write-stream':
+        write_sheet(path, 'Students', HEADERS, student_rows(rows))
+    elif case == 'read-full':
+        wb = openpyxl.load_workbook(path)
+        ws = wb.active
+        headers = [cell.value for cell in ws[1]]
+        count = sum(1 for row in ws.iter_rows(min_row=2, values_only=True) if row[0] and dict(zip(headers, row)))
+        assert count == rows, count
+    elif case == 'read-stream':
+        _, data = read_sheet(path)
+        count = sum(1 for _ in data)
+        assert count == rows, count
+
+
+def child(case, rows, path):
+    start = time.perf_counter()
+    run_case(case, rows, path)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB on Linux
+    print(f"{elapsed:.3f} {peak_kb / 1024:.1f}")
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 500000]
+    print(f"{'rows':>8}  {'case':<13}{'seconds':>10}{'peak RSS MB':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            path = os.path.join(tmp, f'students_{rows}.xlsx')
+            for case in CASES:
+                out = subprocess.run(
+                    [sys.executable, __file__, '--child', case, str(rows), path],
+                    check=True, capture_output=True, text=True
+                ).stdout.split()
+                print(f"{rows:>8}  {case:<13}{float(out[0]):>10.2f}{float(out[1]):>14.1f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    else:
+        main()
@@ -1,23 +1,50 @@
-from flask import Flask, render_template, request, jsonify, send_file, session, redirect
+from flask import Flask, render_template, request, jsonify, send_file, session, redirect, Response, stream_with_context
 from flask_cors import CORS
+import atexit
+import base64
+import json
 import logging
 import os
+import signal
+import sys
+import threading
 from werkzeug.utils import secure_filename
 from datetime import datetime
-from certificate_generator import CertificateGenerator
-import openpyxl
+from template_registry import TemplateRegistry
+from certificate_cache import CertificateCache
+from bulk_certificates import RenderPool, generate_certificates, stream_certificates_zip
+from student_store import StudentStore, SORT_FIELDS
+from student_storage import create_backend, read_students_excel, clean_student_row, STUDENT_FIELDS
+from download_log import DownloadLog
+from excel_io import read_sheet
+from exports import stream_export, EXPORT_FORMATS
+from compression import PrecompressedPage, compress_response
+from static_assets import AssetStore
 from io import BytesIO
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+# Static files are served from ASSETS_DIR by serve_static() below
+app = Flask(__name__, static_folder=None)
 
 # Environment-based configuration
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
 app.config['ADMIN_USERNAME'] = os.environ.get('ADMIN_USERNAME', 'admin')
 app.config['ADMIN_PASSWORD'] = os.environ.get('ADMIN_PASSWORD', 'admin123')
+# Keep rendered certificates in CERTIFICATE_DIR (disable on ephemeral instances)
+app.config['PERSIST_CERTIFICATES'] = os.environ.get('PERSIST_CERTIFICATES', 'true').lower() == 'true'
+
+# Embed an optimized JPEG derivative of the certificate template (quality 1-95;
+# TEMPLATE_DPI below 72 also downsamples it, 0 keeps the source resolution)
+app.config['TEMPLATE_OPTIMIZE'] = os.environ.get('TEMPLATE_OPTIMIZE', 'true').lower() == 'true'
+app.config['TEMPLATE_JPEG_QUALITY'] = int(os.environ.get('TEMPLATE_JPEG_QUALITY', '85'))
+app.config['TEMPLATE_DPI'] = int(os.environ.get('TEMPLATE_DPI', '0')) or None
+# Seconds between checks of TEMPLATE_DIR for changed templates, layouts and batches.json (0 = never)
+app.config['TEMPLATE_RELOAD_INTERVAL'] = float(os.environ.get('TEMPLATE_RELOAD_INTERVAL', '2'))
+# Processes rendering bulk certificate requests (0 = one per CPU core)
+app.config['BULK_RENDER_WORKERS'] = int(os.environ.get('BULK_RENDER_WORKERS', '0')) or None
 
 # AWS-compatible paths
 base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -29,6 +56,16 @@ app.config['EXCEL_DIR'] = os.path.join(base_dir, 'data', 'excel')
 app.config['UPLOAD_FOLDER'] = os.path.join(base_dir, 'data', 'uploads')
 app.config['TEMPLATE_DIR'] = os.path.join(base_dir, 'data', 'templates')
 
+# Student storage: 'sqlite' (default) or the legacy 'excel' workbook
+app.config['STUDENT_STORAGE'] = os.environ.get('STUDENT_STORAGE', 'sqlite').lower()
+app.config['STUDENT_DB_PATH'] = os.environ.get('STUDENT_DB_PATH', os.path.join(base_dir, 'data', 'students.db'))
+app.config['STUDENT_EXCEL_PATH'] = os.path.join(app.config['EXCEL_DIR'], 'student-data.xlsx')
+# Seconds the excel backend waits to coalesce edits into one workbook save
+app.config['EXCEL_WRITE_DELAY'] = float(os.environ.get('EXCEL_WRITE_DELAY', '1.0'))
+app.config['DOWNLOAD_LOG_DIR'] = os.path.join(base_dir, 'data', 'logs')
+# Download log segments are rotated at this size
+app.config['DOWNLOAD_LOG_SEGMENT_BYTES'] = int(os.environ.get('DOWNLOAD_LOG_SEGMENT_MB', '8')) * 1024 * 1024
+
 # Ensure directories exist
 os.makedirs(app.config['CERTIFICATE_DIR'], exist_ok=True)
 os.makedirs(app.config['EXCEL_DIR'], exist_ok=True)
@@ -37,12 +74,38 @@ os.makedirs(app.config['TEMPLATE_DIR'], exist_ok=True)
 
 CORS(app)
 
-# Initialize certificate generator with template directory
-cert_generator = CertificateGenerator(app.config['TEMPLATE_DIR'])
+# Bulk certificate renders run on these processes. They are forked here, before
+# any thread starts, and reused by every request, so they never re-run this module.
+render_pool = RenderPool(app.config['BULK_RENDER_WORKERS'])
+render_pool.start()
+atexit.register(render_pool.shutdown)
+
+# Logo and background images, served with content-hashed URLs
+asset_store = AssetStore(app.config['ASSETS_DIR'])
+
+# Every template in the template directory, mapped to batches by batches.json.
+# Templates are prepared (and optimized) when loaded rather than on the first download.
+template_registry = TemplateRegistry(app.config['TEMPLATE_DIR'],
+                                     optimize=app.config['TEMPLATE_OPTIMIZE'],
+                                     quality=app.config['TEMPLATE_JPEG_QUALITY'],
+                                     dpi=app.config['TEMPLATE_DPI'],
+                                     preload=True)
+if app.config['TEMPLATE_RELOAD_INTERVAL'] > 0:
+    template_registry.start_watching(app.config['TEMPLATE_RELOAD_INTERVAL'])
 
-# Global students data
-students_data = []
-download_logs = []  # Track certificate downloads
+# Rendered certificates are reused until the student, template or layout changes
+certificate_cache = CertificateCache(app.config['CERTIFICATE_DIR'], template_registry, app.config['STUDENT_DB_PATH'])
+
+# Global students data, indexed by SixerClass ID, login fields and batch
+student_store = StudentStore(backend=create_backend(
+    app.config['STUDENT_STORAGE'], app.config['STUDENT_DB_PATH'], app.config['STUDENT_EXCEL_PATH'],
+    excel_write_delay=app.config['EXCEL_WRITE_DELAY']))
+
+# Flush pending writes (write-behind excel backend) on graceful shutdown
+atexit.register(student_store.backend.close)
+# Track certificate downloads (durable append-only log shared by all workers)
+download_log = DownloadLog(app.config['DOWNLOAD_LOG_DIR'], segment_size=app.config['DOWNLOAD_LOG_SEGMENT_BYTES'])
+atexit.register(download_log.close)
 
 def create_sample_data():
     """Create sample student data"""
@@ -91,52 +154,88 @@ def create_sample_data():
         }
     ]
     
-    # Save sample data to Excel using openpyxl
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.append(['student_name', 'batch_number', 'batch_start_date', 'batch_end_date', 'sixerclass_id'])
-    for student in sample_data:
-        ws.append([student['student_name'], student['batch_number'], student['batch_start_date'], student['batch_end_date'], student['sixerclass_id']])
-    
-    excel_path = os.path.join(app.config['EXCEL_DIR'], 'student-data.xlsx')
-    wb.save(excel_path)
-    logger.info(f"✅ Created sample Excel data with 6 students at {excel_path}")
-    
+    logger.info("✅ Created sample data with 6 students")
     return sample_data
 
 # Load students data
 def load_students_data():
-    global students_data
+    backend = student_store.backend
     try:
-        excel_path = os.path.join(app.config['EXCEL_DIR'], 'student-data.xlsx')
-        
-        if os.path.exists(excel_path):
-            wb = openpyxl.load_workbook(excel_path)
-            ws = wb.active
-            students_data = []
-            headers = [cell.value for cell in ws[1]]
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                if row[0]:  # Skip empty rows
-                    student = dict(zip(headers, row))
-                    students_data.append(student)
-            logger.info(f"✅ Loaded {len(students_data)} students from {excel_path}")
-            return students_data
-        
-        logger.warning("❌ No Excel file found, creating sample data")
-        students_data = create_sample_data()
-        return students_data
+        student_store.sync()
+        if len(student_store):
+            logger.info(f"✅ Loaded {len(student_store)} students from {backend.name} storage")
+            return student_store
+        
+        excel_path = app.config['STUDENT_EXCEL_PATH']
+        if backend.name == 'sqlite' and os.path.exists(excel_path):
+            # One-time migration from the legacy workbook; Excel is import/export only afterwards
+            added, _ = student_store.add_many([clean_student_row(row) for row in read_students_excel(excel_path)])
+            logger.info(f"✅ Migrated {len(added)} students from {excel_path} to {app.config['STUDENT_DB_PATH']}")
+            return student_store
+        
+        logger.warning("❌ No student data found, creating sample data")
+        student_store.add_many(create_sample_data())
+        return student_store
         
     except Exception as e:
         logger.error(f"❌ Error loading students data: {e}")
-        students_data = create_sample_data()
-        return students_data
+        # Another worker may have migrated at the same moment; only fall back if still empty
+        try:
+            student_store.sync()
+        except Exception:
+            pass
+        if not len(student_store):
+            student_store.load(create_sample_data())
+        return student_store
 
 # Load initial data
 load_students_data()
 
-@app.route('/')
-def index():
-    return '''
+# Build the admin search index in the background so the first search is instant
+threading.Thread(target=student_store.build_search_index, name='search-index', daemon=True).start()
+
+def dataset_etag():
+    """Version of the student and download data, used as an ETag
+    
+    Both parts only ever grow: the student storage version moves on every
+    add, update, delete and import (in any worker) and the download count
+    on every logged download. sync_shared_state() has already brought both
+    up to date for the current request.
+    """
+    return f"{student_store.version}-{download_log.stats.total_downloads}"
+
+def versioned_json(build_payload):
+    """JSON response tagged with dataset_etag()
+    
+    If the client already holds the current version (If-None-Match), a 304
+    is returned and build_payload is never called.
+    """
+    etag = dataset_etag()
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build_payload())
+    response.set_etag(etag)
+    # Let browsers cache it but revalidate on every request
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.after_request
+def compress_large_responses(response):
+    """gzip/brotli for large JSON and other dynamic text responses"""
+    return compress_response(request, response)
+
+@app.before_request
+def sync_shared_state():
+    """Pick up students and downloads written by other worker processes"""
+    try:
+        student_store.sync()
+        download_log.refresh()
+    except Exception as e:
+        logger.error(f"❌ Error syncing shared state: {e}")
+
+# Pages are fixed HTML, compressed once at startup
+INDEX_HTML = '''
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -474,22 +573,26 @@ def index():
                     const result = await response.json();
                     
                     if (result.success) {
-                        // Download certificate
-                        const downloadResponse = await fetch('/api/download-certificate', {
+                        // Download certificate (PDF comes back in the same response)
+                        const downloadResponse = await fetch('/api/download-certificate?inline=1', {
                             method: 'POST'
                         });
                         
-                        const downloadResult = await downloadResponse.json();
-                        
-                        if (downloadResult.success) {
+                        if (downloadResponse.ok) {
+                            const disposition = downloadResponse.headers.get('Content-Disposition') || '';
+                            const match = disposition.match(/filename="?([^";]+)"?/);
+                            const blob = await downloadResponse.blob();
+                            const url = window.URL.createObjectURL(blob);
                             const link = document.createElement('a');
-                            link.href = downloadResult.download_url;
-                            link.download = downloadResult.filename;
+                            link.href = url;
+                            link.download = match ? match[1] : 'certificate.pdf';
                             document.body.appendChild(link);
                             link.click();
                             document.body.removeChild(link);
+                            window.URL.revokeObjectURL(url);
                             alert('Certificate downloaded successfully!');
                         } else {
+                            const downloadResult = await downloadResponse.json();
                             alert('Certificate generation failed: ' + downloadResult.error);
                         }
                     } else {
@@ -504,17 +607,20 @@ def index():
     </html>
     '''
 
-@app.route('/static/<filename>')
+INDEX_PAGE = PrecompressedPage(asset_store.versioned(INDEX_HTML))
+
+@app.route('/')
+def index():
+    return INDEX_PAGE.response(request)
+
+@app.route('/static/<path:filename>')
 def serve_static(filename):
-    """Serve static files like logo"""
+    """Serve static files like logo (plain or content-hashed names)"""
     try:
-        if filename == 'Magicbus_logo.png':
-            logo_path = os.path.join(app.config['ASSETS_DIR'], 'Magicbus_logo.png')
-            return send_file(logo_path, mimetype='image/png')
-        elif filename == 'bus.png':
-            bus_path = os.path.join(app.config['ASSETS_DIR'], 'bus.png')
-            return send_file(bus_path, mimetype='image/png')
-        return jsonify({"error": "File not found"}), 404
+        response = asset_store.response(request, filename)
+        if response is None:
+            return jsonify({"error": "File not found"}), 404
+        return response
     except Exception as e:
         logger.error(f"❌ Error serving static file: {e}")
         return jsonify({"error": "File serving failed"}), 500
@@ -523,7 +629,7 @@ def serve_static(filename):
 def check_status():
     return jsonify({
         "status": "operational",
-        "students_loaded": len(students_data),
+        "students_loaded": len(student_store),
         "timestamp": datetime.now().isoformat(),
         "version": "4.0.0-Production-Ready"
     })
@@ -537,13 +643,7 @@ def authenticate():
         sixerclass_id = data.get('sixerclass_id')
 
         # Find student
-        student = None
-        for s in students_data:
-            if (s['student_name'] == student_name and 
-                s['batch_number'] == batch_number and 
-                s['sixerclass_id'] == sixerclass_id):
-                student = s
-                break
+        student = student_store.find(student_name, batch_number, sixerclass_id)
 
         if student:
             session['student'] = student
@@ -563,19 +663,28 @@ def download_certificate():
         if 'student' not in session:
             return jsonify({"error": "Please authenticate first"}), 401
 
-        student = session['student']
-        
-        # Generate certificate
-        safe_name = secure_filename(student['student_name'].replace(' ', '_'))
-        filename = f"certificate_{student['sixerclass_id']}_{safe_name}.pdf"
-        filepath = os.path.join(app.config['CERTIFICATE_DIR'], filename)
-        
-        # Create certificate
-        success = cert_generator.create_certificate(student, filepath)
+        # The session holds the record from login; certificates are drawn
+        # from the current one, which an admin may have edited since
+        student = student_store.get(session['student']['sixerclass_id'])
+        if student is None:
+            session.pop('student', None)
+            return jsonify({"error": "Student record no longer exists. Please authenticate again"}), 401
+        
+        # ?inline=1 returns the PDF itself instead of a link to serve-certificate
+        inline = request.args.get('inline') == '1'
+        
+        # Generate certificate (or reuse the cached one)
+        if inline:
+            filename, pdf_data = certificate_cache.get_certificate_bytes(
+                student, persist=app.config['PERSIST_CERTIFICATES'])
+            if pdf_data is None:
+                filename = None
+        else:
+            filename = certificate_cache.get_certificate(student)
         
-        if success:
+        if filename:
             # Log the download
-            download_logs.append({
+            download_log.append({
                 'student_name': student['student_name'],
                 'sixerclass_id': student['sixerclass_id'],
                 'batch_number': student['batch_number'],
@@ -583,6 +692,9 @@ def download_certificate():
                 'filename': filename
             })
             logger.info(f"✅ Certificate generated: {filename}")
+            if inline:
+                return send_file(BytesIO(pdf_data), mimetype='application/pdf',
+                                 as_attachment=True, download_name=filename)
             return jsonify({
                 "success": True,
                 "download_url": f"/api/serve-certificate/{filename}",
@@ -614,12 +726,66 @@ def serve_certificate(filename):
         logger.error(f"❌ File serving error: {e}")
         return jsonify({"error": "File serving failed"}), 500
 
+@app.route('/admin/api/serve-certificates/<batch_number>')
+def serve_batch_certificates(batch_number):
+    """Stream a ZIP of every certificate in a batch"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    try:
+        students = student_store.by_batch(batch_number)
+        if not students:
+            return jsonify({"error": "No students found for batch"}), 404
+        
+        filename = f"certificates_{secure_filename(batch_number)}.zip"
+        logger.info(f"✅ Streaming {len(students)} certificates as {filename}")
+        return Response(
+            stream_with_context(stream_certificates_zip(certificate_cache, students,
+                                                        persist=app.config['PERSIST_CERTIFICATES'])),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+        
+    except Exception as e:
+        logger.error(f"❌ Batch ZIP error: {e}")
+        return jsonify({"error": "File serving failed"}), 500
+
+@app.route('/admin/api/serve-batch-certificate/<batch_number>')
+def serve_batch_certificate_pdf(batch_number):
+    """Serve one multi-page PDF with every certificate in a batch (for printing)"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    try:
+        students = student_store.by_batch(batch_number)
+        if not students:
+            return jsonify({"error": "No students found for batch"}), 404
+        
+        filename = f"certificates_{secure_filename(batch_number)}.pdf"
+        
+        # Rendered in memory: nothing shared between concurrent requests and
+        # nothing left in CERTIFICATE_DIR
+        generator = template_registry.generator_for_batch(batch_number)
+        pdf_data = generator and generator.render_batch_certificate(
+            students, issue_dates=certificate_cache.issue_dates(students))
+        
+        if pdf_data:
+            logger.info(f"✅ Serving batch certificate: {filename}")
+            return send_file(BytesIO(pdf_data), mimetype='application/pdf',
+                             as_attachment=True, download_name=filename)
+        else:
+            return jsonify({"error": "Certificate generation failed"}), 500
+        
+    except Exception as e:
+        logger.error(f"❌ Batch PDF error: {e}")
+        return jsonify({"error": "Certificate generation failed"}), 500
+
 @app.route('/api/students')
 def get_students():
-    return jsonify({
+    return versioned_json(lambda: {
         "success": True,
-        "count": len(students_data),
-        "students": students_data
+        "count": len(student_store),
+        "students": student_store.all()
     })
 
 # ADMIN ROUTES WITH AUTHENTICATION
@@ -627,21 +793,7 @@ def get_students():
 def admin_redirect():
     return redirect('/admin/login')
 
-@app.route('/admin/login', methods=['GET', 'POST'])
-def admin_login():
-    if request.method == 'POST':
-        data = request.get_json()
-        username = data.get('username')
-        password = data.get('password')
-        
-        # Environment-based admin credentials
-        if username == app.config['ADMIN_USERNAME'] and password == app.config['ADMIN_PASSWORD']:
-            session['admin_logged_in'] = True
-            return jsonify({"success": True})
-        else:
-            return jsonify({"error": "Invalid credentials"}), 401
-    
-    return '''
+ADMIN_LOGIN_HTML = '''
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -951,20 +1103,31 @@ def admin_login():
     </html>
     '''
 
+ADMIN_LOGIN_PAGE = PrecompressedPage(asset_store.versioned(ADMIN_LOGIN_HTML))
+
+@app.route('/admin/login', methods=['GET', 'POST'])
+def admin_login():
+    if request.method == 'POST':
+        data = request.get_json()
+        username = data.get('username')
+        password = data.get('password')
+        
+        # Environment-based admin credentials
+        if username == app.config['ADMIN_USERNAME'] and password == app.config['ADMIN_PASSWORD']:
+            session['admin_logged_in'] = True
+            return jsonify({"success": True})
+        else:
+            return jsonify({"error": "Invalid credentials"}), 401
+    
+    return ADMIN_LOGIN_PAGE.response(request)
+
 def require_admin_auth():
     """Check if admin is logged in"""
     if not session.get('admin_logged_in'):
         return redirect('/admin/login')
     return None
 
-@app.route('/admin/students')
-def admin_students():
-    # Check authentication
-    auth_check = require_admin_auth()
-    if auth_check:
-        return auth_check
-    
-    return '''
+ADMIN_STUDENTS_HTML = '''
     <!DOCTYPE html>
     <html lang="en">
     <head>
@@ -1411,17 +1574,17 @@ def admin_students():
             
             <div id="alertContainer"></div>
             
-            <input type="text" class="search-box" id="searchBox" placeholder="🔍 Search students by name, batch, or ID..." onkeyup="filterStudents()">
+            <input type="text" class="search-box" id="searchBox" placeholder="🔍 Search students by name, batch, or ID..." oninput="filterStudents()">
             
             <div class="table-container">
                 <table id="studentsTable">
                     <thead>
                         <tr>
-                            <th>SixerClass ID</th>
-                            <th>Student Name</th>
-                            <th>Batch Number</th>
-                            <th>Start Date</th>
-                            <th>End Date</th>
+                            <th onclick="sortStudents('sixerclass_id')" style="cursor: pointer;">SixerClass ID</th>
+                            <th onclick="sortStudents('student_name')" style="cursor: pointer;">Student Name</th>
+                            <th onclick="sortStudents('batch_number')" style="cursor: pointer;">Batch Number</th>
+                            <th onclick="sortStudents('batch_start_date')" style="cursor: pointer;">Start Date</th>
+                            <th onclick="sortStudents('batch_end_date')" style="cursor: pointer;">End Date</th>
                             <th>Actions</th>
                         </tr>
                     </thead>
@@ -1432,6 +1595,12 @@ def admin_students():
                     </tbody>
                 </table>
             </div>
+            
+            <div class="actions" style="justify-content: center; align-items: center;">
+                <button class="btn btn-success" id="prevPage" onclick="loadStudents(currentPage - 1)">← Previous</button>
+                <span id="pageInfo"></span>
+                <button class="btn btn-success" id="nextPage" onclick="loadStudents(currentPage + 1)">Next →</button>
+            </div>
         </div>
         
         <!-- Add Student Modal -->
@@ -1543,17 +1712,36 @@ def admin_students():
         </div>
         
         <script>
-            let allStudents = [];
+            const PAGE_SIZE = 100;
+            let pageStudents = [];      // students on the current page
+            let pageCursors = [null];   // cursor that opens each visited page
+            let currentPage = 0;
+            let currentSort = 'sixerclass_id';
+            let currentOrder = 'asc';
+            let searchTimer = null;
             
-            async function loadStudents() {
+            async function loadStudents(page = currentPage) {
                 try {
-                    const response = await fetch('/admin/api/students');
+                    const params = new URLSearchParams({ limit: PAGE_SIZE, sort: currentSort, order: currentOrder });
+                    const search = document.getElementById('searchBox').value.trim();
+                    if (search) params.set('search', search);
+                    if (pageCursors[page]) params.set('cursor', pageCursors[page]);
+                    
+                    const response = await fetch(`/admin/api/students?${params}`);
                     const data = await response.json();
                     
                     if (data.success) {
-                        allStudents = data.students;
-                        displayStudents(allStudents);
-                        updateStats();
+                        // The page was emptied (e.g. its last student deleted): go back one
+                        if (data.students.length === 0 && page > 0) {
+                            return loadStudents(page - 1);
+                        }
+                        currentPage = page;
+                        pageCursors[page + 1] = data.next_cursor;
+                        pageCursors.length = page + 2;
+                        pageStudents = data.students;
+                        displayStudents(pageStudents);
+                        updateStats(data);
+                        updatePager(data);
                     } else {
                         showAlert('Failed to load students', 'error');
                     }
@@ -1587,24 +1775,46 @@ def admin_students():
                 `).join('');
             }
             
-            function updateStats() {
-                document.getElementById('totalStudents').textContent = allStudents.length;
+            function updateStats(data) {
+                if (document.getElementById('searchBox').value.trim()) return;  // totals of a search are not overall stats
                 
-                const batches = new Set(allStudents.map(s => s.batch_number));
-                document.getElementById('totalBatches').textContent = batches.size;
+                document.getElementById('totalStudents').textContent = data.total;
+                document.getElementById('totalBatches').textContent = data.total_batches;
                 
-                const recentCount = Math.ceil(allStudents.length * 0.1);
+                const recentCount = Math.ceil(data.total * 0.1);
                 document.getElementById('recentStudents').textContent = recentCount;
             }
             
+            function updatePager(data) {
+                const pages = Math.max(1, Math.ceil(data.total / PAGE_SIZE));
+                document.getElementById('pageInfo').textContent = `Page ${currentPage + 1} of ${pages} (${data.total} students)`;
+                document.getElementById('prevPage').disabled = currentPage === 0;
+                document.getElementById('nextPage').disabled = !data.next_cursor;
+            }
+            
+            function resetPaging() {
+                pageCursors = [null];
+                currentPage = 0;
+            }
+            
+            function sortStudents(field) {
+                if (currentSort === field) {
+                    currentOrder = currentOrder === 'asc' ? 'desc' : 'asc';
+                } else {
+                    currentSort = field;
+                    currentOrder = 'asc';
+                }
+                resetPaging();
+                loadStudents(0);
+            }
+            
             function filterStudents() {
-                const searchTerm = document.getElementById('searchBox').value.toLowerCase();
-                const filtered = allStudents.filter(student => 
-                    student.student_name.toLowerCase().includes(searchTerm) ||
-                    student.batch_number.toLowerCase().includes(searchTerm) ||
-                    student.sixerclass_id.toLowerCase().includes(searchTerm)
-                );
-                displayStudents(filtered);
+                // Search runs on the server; wait for a pause in typing
+                clearTimeout(searchTimer);
+                searchTimer = setTimeout(() => {
+                    resetPaging();
+                    loadStudents(0);
+                }, 250);
             }
             
             async function exportStudents() {
@@ -1769,7 +1979,7 @@ def admin_students():
             });
             
             async function generateCertificate(sixerclassId) {
-                const student = allStudents.find(s => s.sixerclass_id === sixerclassId);
+                const student = pageStudents.find(s => s.sixerclass_id === sixerclassId);
                 if (!student) {
                     showAlert('Student not found', 'error');
                     return;
@@ -1802,7 +2012,7 @@ def admin_students():
             }
             
             function editStudent(sixerclassId) {
-                const student = allStudents.find(s => s.sixerclass_id === sixerclassId);
+                const student = pageStudents.find(s => s.sixerclass_id === sixerclassId);
                 if (!student) {
                     showAlert('Student not found', 'error');
                     return;
@@ -1968,67 +2178,144 @@ def admin_students():
     </html>
     '''
 
+ADMIN_STUDENTS_PAGE = PrecompressedPage(asset_store.versioned(ADMIN_STUDENTS_HTML), cache_control='private, no-cache')
+
+@app.route('/admin/students')
+def admin_students():
+    # Check authentication
+    auth_check = require_admin_auth()
+    if auth_check:
+        return auth_check
+    
+    return ADMIN_STUDENTS_PAGE.response(request)
+
 # ADMIN API ROUTES
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(sort, order, sort_key):
+    """Opaque cursor pointing just past sort_key in the given ordering"""
+    raw = json.dumps([sort, order, *sort_key]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor):
+    """(sort, order, sort_key) from encode_cursor(); raises ValueError if malformed"""
+    try:
+        sort, order, *sort_key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if sort not in SORT_FIELDS or order not in ('asc', 'desc') or len(sort_key) != 2:
+        raise ValueError("Invalid cursor")
+    return sort, order, tuple(sort_key)
+
 @app.route('/admin/api/students')
 def admin_api_students():
-    """Get all students with optional search"""
+    """Get students with optional search, sorting, paging and field selection
+    
+    Query parameters: search, sort (any student field) and order (asc/desc),
+    limit (at most MAX_PAGE_SIZE; all students if omitted), offset or the
+    next_cursor of the previous page as cursor (sorted listings only), and
+    fields (comma separated) to return only some columns. total is the
+    number of matching students across all pages.
+    """
     # Check authentication
     if not session.get('admin_logged_in'):
         return jsonify({"error": "Unauthorized"}), 401
     
     try:
         search = request.args.get('search', '').lower()
+        sort = request.args.get('sort') or None
+        order = request.args.get('order', 'asc').lower()
+        limit = request.args.get('limit', type=int)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
+        
+        after = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                sort, order, after = decode_cursor(cursor)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        
+        if sort is not None and sort not in SORT_FIELDS:
+            return jsonify({"error": f"Invalid sort field: {sort}"}), 400
+        if order not in ('asc', 'desc'):
+            return jsonify({"error": "order must be asc or desc"}), 400
+        if limit is not None and limit < 0:
+            return jsonify({"error": "limit must not be negative"}), 400
+        if limit is not None:
+            limit = min(limit, MAX_PAGE_SIZE)
+        unknown_fields = [f for f in fields if f not in STUDENT_FIELDS]
+        if unknown_fields:
+            return jsonify({"error": f"Invalid fields: {', '.join(unknown_fields)}"}), 400
+        
+        def build_page():
+            # Substring search is answered by the store's trigram index
+            total, students = student_store.page(sort=sort, descending=order == 'desc', after=after,
+                                                 offset=offset, limit=limit, search=search)
+            
+            # Cursor for the next page of a sorted listing, if the page was full
+            next_cursor = None
+            if sort and limit and len(students) == limit:
+                next_cursor = encode_cursor(sort, order, StudentStore.sort_key(students[-1], sort))
+            
+            if fields:
+                students = [{f: s[f] for f in fields} for s in students]
+            
+            return {
+                "success": True,
+                "total": total,
+                "total_batches": len(student_store.batch_numbers()),
+                "students": students,
+                "next_cursor": next_cursor
+            }
         
-        if search:
-            filtered_students = [
-                s for s in students_data 
-                if search in s['student_name'].lower() or 
-                   search in s['batch_number'].lower() or 
-                   search in s['sixerclass_id'].lower()
-            ]
-        else:
-            filtered_students = students_data
-        
-        return jsonify({
-            "success": True,
-            "total": len(filtered_students),
-            "students": filtered_students
-        })
+        return versioned_json(build_page)
     except Exception as e:
         logger.error(f"❌ Error getting students: {e}")
         return jsonify({"error": "Failed to get students"}), 500
 
+def export_response(basename, title, headers, rows):
+    """Stream an export in the format requested by ?format= (xlsx, csv or ndjson)
+    
+    Nothing is written to EXCEL_DIR unless ?save=1 is given, in which case
+    the export is kept there and then sent as before.
+    """
+    export_format = request.args.get('format', 'xlsx').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    # Create filename with timestamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{basename}_{timestamp}.{export_format}"
+    chunks = stream_export(export_format, title, headers, rows)
+    
+    if request.args.get('save') == '1':
+        filepath = os.path.join(app.config['EXCEL_DIR'], filename)
+        with open(filepath, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        logger.info(f"✅ Exported to: {filename}")
+        return send_file(filepath, as_attachment=True, download_name=filename, mimetype=EXPORT_FORMATS[export_format])
+    
+    logger.info(f"✅ Streaming export: {filename}")
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
 @app.route('/admin/api/students/export')
 def admin_export_students():
-    """Export students to Excel"""
+    """Export students (xlsx, csv or ndjson)"""
     # Check authentication
     if not session.get('admin_logged_in'):
         return jsonify({"error": "Unauthorized"}), 401
     
     try:
-        # Create workbook and worksheet
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Students"
-        
-        # Add headers
-        headers = ['student_name', 'batch_number', 'batch_start_date', 'batch_end_date', 'sixerclass_id']
-        ws.append(headers)
-        
-        # Add data
-        for student in students_data:
-            ws.append([student[header] for header in headers])
-        
-        # Create filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"students_export_{timestamp}.xlsx"
-        filepath = os.path.join(app.config['EXCEL_DIR'], filename)
-        
-        # Save to file
-        wb.save(filepath)
-        
-        logger.info(f"✅ Students exported to: {filename}")
-        return send_file(filepath, as_attachment=True, download_name=filename)
+        headers = STUDENT_FIELDS
+        rows = ([student[header] for header in headers] for student in student_store.all())
+        return export_response("students_export", "Students", headers, rows)
         
     except Exception as e:
         logger.error(f"❌ Error exporting students: {e}")
@@ -2037,8 +2324,6 @@ def admin_export_students():
 @app.route('/admin/api/students/import', methods=['POST'])
 def admin_import_students():
     """Import students from Excel file"""
-    global students_data
-    
     # Check authentication
     if not session.get('admin_logged_in'):
         return jsonify({"error": "Unauthorized"}), 401
@@ -2059,75 +2344,37 @@ def admin_import_students():
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(filepath)
         
-        # Read Excel file - try first sheet
+        # Read Excel file - first sheet, rows streamed in read-only mode
         try:
-            wb = openpyxl.load_workbook(filepath)
-            ws = wb.active
-            
-            # Get headers from first row
-            headers = [cell.value for cell in ws[1]]
-            
-            # Read data rows
-            data_rows = []
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                if row[0]:  # Skip empty rows
-                    data_rows.append(dict(zip(headers, row)))
-                    
+            sheet = read_sheet(filepath)
         except Exception as e:
             logger.error(f"Error reading Excel: {e}")
             return jsonify({"error": f"Cannot read Excel file: {str(e)}"}), 400
         
-        # Validate required columns
-        required_columns = ['student_name', 'batch_number', 'batch_start_date', 'batch_end_date', 'sixerclass_id']
-        missing_columns = [col for col in required_columns if col not in headers]
-        
-        if missing_columns:
-            return jsonify({
-                "error": f"Missing required columns: {', '.join(missing_columns)}"
-            }), 400
-        
-        # Convert to records and clean data
-        new_students = []
-        for row_data in data_rows:
-            try:
-                student = {
-                    'student_name': str(row_data['student_name']).strip(),
-                    'batch_number': str(row_data['batch_number']).strip(),
-                    'batch_start_date': str(row_data['batch_start_date']).strip(),
-                    'batch_end_date': str(row_data['batch_end_date']).strip(),
-                    'sixerclass_id': str(row_data['sixerclass_id']).strip()
-                }
-                new_students.append(student)
-            except Exception as e:
-                logger.error(f"Error processing row: {e}")
-                continue
-        
-        # Validate and add students
-        imported_count = 0
-        errors = []
-        
-        for student in new_students:
-            # Check for duplicates
-            if any(s['sixerclass_id'] == student['sixerclass_id'] for s in students_data):
-                errors.append(f"Duplicate SixerClass ID: {student['sixerclass_id']}")
-                continue
+        with sheet:
+            # Validate required columns
+            required_columns = ['student_name', 'batch_number', 'batch_start_date', 'batch_end_date', 'sixerclass_id']
+            missing_columns = [col for col in required_columns if col not in sheet.headers]
             
-            # Add to students_data
-            students_data.append(student)
-            imported_count += 1
-        
-        # Save updated data to Excel
-        try:
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.append(['student_name', 'batch_number', 'batch_start_date', 'batch_end_date', 'sixerclass_id'])
-            for student in students_data:
-                ws.append([student['student_name'], student['batch_number'], student['batch_start_date'], student['batch_end_date'], student['sixerclass_id']])
+            if missing_columns:
+                return jsonify({
+                    "error": f"Missing required columns: {', '.join(missing_columns)}"
+                }), 400
             
-            updated_excel_path = os.path.join(app.config['EXCEL_DIR'], 'student-data.xlsx')
-            wb.save(updated_excel_path)
-        except Exception as e:
-            logger.error(f"Error saving data: {e}")
+            # Convert to records and clean data
+            new_students = []
+            for row_data in sheet.rows:
+                try:
+                    new_students.append(clean_student_row(row_data))
+                except Exception as e:
+                    logger.error(f"Error processing row: {e}")
+                    continue
+        
+        # Add students in one write; duplicates are rejected by the ID index
+        added, duplicates = student_store.add_many(new_students)
+        imported_count = len(added)
+        template_registry.evict_batch_layers({student['batch_number'] for student in added})
+        errors = [f"Duplicate SixerClass ID: {student['sixerclass_id']}" for student in duplicates]
         
         logger.info(f"✅ Imported {imported_count} students from {filename}")
         
@@ -2145,8 +2392,6 @@ def admin_import_students():
 @app.route('/admin/api/students/update', methods=['POST'])
 def admin_update_student():
     """Update student details"""
-    global students_data
-    
     # Check authentication
     if not session.get('admin_logged_in'):
         return jsonify({"error": "Unauthorized"}), 401
@@ -2159,13 +2404,7 @@ def admin_update_student():
             return jsonify({"error": "Original SixerClass ID required"}), 400
         
         # Find student to update
-        student_index = None
-        for i, s in enumerate(students_data):
-            if s['sixerclass_id'] == original_id:
-                student_index = i
-                break
-        
-        if student_index is None:
+        if original_id not in student_store:
             return jsonify({"error": "Student not found"}), 404
         
         # Validate required fields
@@ -2177,37 +2416,37 @@ def admin_update_student():
         # Check for duplicate SixerClass ID (if changed)
         new_id = data['sixerclass_id']
         if new_id != original_id:
-            if any(s['sixerclass_id'] == new_id for s in students_data):
+            if new_id in student_store:
                 return jsonify({"error": f"SixerClass ID {new_id} already exists"}), 400
         
+        # Cached certificate no longer matches the student record
+        certificate_cache.invalidate(original_id)
+        original = student_store.get(original_id)
+        
         # Update student
-        students_data[student_index] = {
+        updated_student = {
             'student_name': data['student_name'].strip(),
             'batch_number': data['batch_number'].strip(),
             'batch_start_date': data['batch_start_date'].strip(),
             'batch_end_date': data['batch_end_date'].strip(),
             'sixerclass_id': data['sixerclass_id'].strip()
         }
+        if not student_store.update(original_id, updated_student):
+            return jsonify({"error": f"SixerClass ID {new_id} already exists"}), 400
+        # The issue date stays with the student under the new ID
+        certificate_cache.rename(original_id, updated_student['sixerclass_id'])
         
-        # Save to Excel file
-        try:
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.append(['student_name', 'batch_number', 'batch_start_date', 'batch_end_date', 'sixerclass_id'])
-            for student in students_data:
-                ws.append([student['student_name'], student['batch_number'], student['batch_start_date'], student['batch_end_date'], student['sixerclass_id']])
-            
-            excel_path = os.path.join(app.config['EXCEL_DIR'], 'student-data.xlsx')
-            wb.save(excel_path)
-        except Exception as e:
-            logger.error(f"Error saving data: {e}")
+        # The batch layer drawn for the old batch and dates is no longer current
+        if original and any(original[field] != updated_student[field]
+                            for field in ('batch_number', 'batch_start_date', 'batch_end_date')):
+            template_registry.evict_batch_layers([original['batch_number']])
         
         logger.info(f"✅ Updated student: {data['student_name']} ({data['sixerclass_id']})")
         
         return jsonify({
             "success": True,
             "message": f"Student {data['student_name']} updated successfully",
-            "student": students_data[student_index]
+            "student": updated_student
         })
         
     except Exception as e:
@@ -2223,8 +2462,6 @@ def admin_logout():
 @app.route('/admin/api/students/add', methods=['POST'])
 def admin_add_student():
     """Add a new student manually"""
-    global students_data
-    
     # Check authentication
     if not session.get('admin_logged_in'):
         return jsonify({"error": "Unauthorized"}), 401
@@ -2239,7 +2476,7 @@ def admin_add_student():
                 return jsonify({"error": f"Missing required field: {field}"}), 400
         
         # Check for duplicate SixerClass ID
-        if any(s['sixerclass_id'] == data['sixerclass_id'] for s in students_data):
+        if data['sixerclass_id'] in student_store:
             return jsonify({"error": f"SixerClass ID {data['sixerclass_id']} already exists"}), 400
         
         # Create new student
@@ -2251,21 +2488,9 @@ def admin_add_student():
             'sixerclass_id': data['sixerclass_id'].strip()
         }
         
-        # Add to students_data
-        students_data.append(new_student)
-        
-        # Save to Excel file
-        try:
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.append(['student_name', 'batch_number', 'batch_start_date', 'batch_end_date', 'sixerclass_id'])
-            for student in students_data:
-                ws.append([student['student_name'], student['batch_number'], student['batch_start_date'], student['batch_end_date'], student['sixerclass_id']])
-            
-            excel_path = os.path.join(app.config['EXCEL_DIR'], 'student-data.xlsx')
-            wb.save(excel_path)
-        except Exception as e:
-            logger.error(f"Error saving data: {e}")
+        # Add to the store
+        if not student_store.add(new_student):
+            return jsonify({"error": f"SixerClass ID {new_student['sixerclass_id']} already exists"}), 400
         
         logger.info(f"✅ Added new student: {new_student['student_name']} ({new_student['sixerclass_id']})")
         
@@ -2282,8 +2507,6 @@ def admin_add_student():
 @app.route('/admin/api/students/delete', methods=['POST'])
 def admin_delete_student():
     """Delete a student"""
-    global students_data
-    
     # Check authentication
     if not session.get('admin_logged_in'):
         return jsonify({"error": "Unauthorized"}), 401
@@ -2296,24 +2519,10 @@ def admin_delete_student():
             return jsonify({"error": "SixerClass ID required"}), 400
         
         # Find and remove student
-        original_count = len(students_data)
-        students_data = [s for s in students_data if s['sixerclass_id'] != sixerclass_id]
-        
-        if len(students_data) == original_count:
+        if student_store.delete(sixerclass_id) is None:
             return jsonify({"error": "Student not found"}), 404
         
-        # Save updated data to Excel
-        try:
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.append(['student_name', 'batch_number', 'batch_start_date', 'batch_end_date', 'sixerclass_id'])
-            for student in students_data:
-                ws.append([student['student_name'], student['batch_number'], student['batch_start_date'], student['batch_end_date'], student['sixerclass_id']])
-            
-            excel_path = os.path.join(app.config['EXCEL_DIR'], 'student-data.xlsx')
-            wb.save(excel_path)
-        except Exception as e:
-            logger.error(f"Error saving data: {e}")
+        certificate_cache.invalidate(sixerclass_id)
         
         logger.info(f"✅ Deleted student with ID: {sixerclass_id}")
         
@@ -2340,14 +2549,10 @@ def admin_generate_certificate():
         if not student:
             return jsonify({"error": "Student data required"}), 400
         
-        # Generate certificate
-        safe_name = secure_filename(student['student_name'].replace(' ', '_'))
-        filename = f"certificate_{student['sixerclass_id']}_{safe_name}.pdf"
-        filepath = os.path.join(app.config['CERTIFICATE_DIR'], filename)
-        
-        success = cert_generator.create_certificate(student, filepath)
+        # Generate certificate (or reuse the cached one)
+        filename = certificate_cache.get_certificate(student)
         
-        if success:
+        if filename:
             logger.info(f"✅ Admin certificate generated: {filename}")
             return jsonify({
                 "success": True,
@@ -2362,82 +2567,118 @@ def admin_generate_certificate():
         logger.error(f"❌ Admin certificate error: {e}")
         return jsonify({"error": "Certificate generation failed"}), 500
 
+@app.route('/admin/api/generate-certificates', methods=['POST'])
+def admin_generate_certificates():
+    """Generate certificates for a whole batch or a list of SixerClass IDs"""
+    if not session.get('admin_logged_in'):
+        return jsonify({"error": "Unauthorized"}), 401
+    
+    try:
+        data = request.get_json() or {}
+        try:
+            summary = generate_certificates(certificate_cache, student_store, render_pool,
+                                            batch_number=data.get('batch_number'),
+                                            sixerclass_ids=data.get('sixerclass_ids'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 404
+        
+        for result in summary['results']:
+            if result.get('status') in ('generated', 'cached'):
+                result['download_url'] = f"/api/serve-certificate/{result['filename']}"
+        
+        return jsonify({"success": True, "summary": summary})
+        
+    except Exception as e:
+        logger.error(f"❌ Bulk certificate error: {e}")
+        return jsonify({"error": "Bulk certificate generation failed"}), 500
+
 @app.route('/admin/api/reports')
 def admin_reports():
-    """Get certificate download reports"""
+    """Get certificate download reports
+    
+    Optional query parameters for student_downloads: sort (download_count,
+    last_download, student_name, sixerclass_id, batch_number), order
+    (desc/asc), limit and offset. top=N is shorthand for the N most
+    downloaded students.
+    """
     if not session.get('admin_logged_in'):
         return jsonify({"error": "Unauthorized"}), 401
     
     try:
-        # Calculate statistics
-        total_downloads = len(download_logs)
-        unique_students = len(set(log['sixerclass_id'] for log in download_logs))
-        avg_downloads = round(total_downloads / unique_students, 1) if unique_students > 0 else 0
-        
-        # Group downloads by student
-        student_downloads = {}
-        for log in download_logs:
-            sid = log['sixerclass_id']
-            if sid not in student_downloads:
-                student_downloads[sid] = {
-                    'student_name': log['student_name'],
-                    'sixerclass_id': log['sixerclass_id'],
-                    'batch_number': log['batch_number'],
-                    'download_count': 0,
-                    'last_download': log['download_time']
+        stats = download_log.stats
+        
+        sort = request.args.get('sort')
+        descending = request.args.get('order', 'desc').lower() != 'asc'
+        limit = request.args.get('limit', type=int)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        top = request.args.get('top', type=int)
+        if top is not None:
+            sort, descending, limit, offset = sort or 'download_count', True, top, 0
+        if sort and sort not in stats.SORT_KEYS:
+            return jsonify({"error": f"Invalid sort field: {sort}"}), 400
+        if limit is not None and limit < 0:
+            return jsonify({"error": "limit must not be negative"}), 400
+        
+        def build_reports():
+            # Statistics are aggregated by the download log as events arrive
+            total_downloads = stats.total_downloads
+            unique_students = stats.unique_students
+            avg_downloads = round(total_downloads / unique_students, 1) if unique_students > 0 else 0
+            
+            return {
+                "success": True,
+                "reports": {
+                    "total_downloads": total_downloads,
+                    "unique_students": unique_students,
+                    "avg_downloads": avg_downloads,
+                    "student_downloads": stats.students(sort=sort, descending=descending, offset=offset, limit=limit),
+                    "batch_downloads": stats.batches()
                 }
-            student_downloads[sid]['download_count'] += 1
-            if log['download_time'] > student_downloads[sid]['last_download']:
-                student_downloads[sid]['last_download'] = log['download_time']
-        
-        return jsonify({
-            "success": True,
-            "reports": {
-                "total_downloads": total_downloads,
-                "unique_students": unique_students,
-                "avg_downloads": avg_downloads,
-                "student_downloads": list(student_downloads.values())
             }
-        })
+        
+        return versioned_json(build_reports)
     except Exception as e:
         logger.error(f"❌ Error generating reports: {e}")
         return jsonify({"error": "Failed to generate reports"}), 500
 
 @app.route('/admin/api/reports/export')
 def admin_export_reports():
-    """Export certificate download reports to Excel"""
+    """Export certificate download reports (xlsx, csv or ndjson)"""
     if not session.get('admin_logged_in'):
         return jsonify({"error": "Unauthorized"}), 401
     
     try:
-        # Create workbook and worksheet
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Reports"
-        
-        # Add headers
         headers = ['Student Name', 'SixerClass ID', 'Batch Number', 'Download Time', 'Filename']
-        ws.append(headers)
-        
-        # Add data
-        for log in download_logs:
-            ws.append([log['student_name'], log['sixerclass_id'], log['batch_number'], log['download_time'], log['filename']])
-        
-        # Create filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"certificate_reports_{timestamp}.xlsx"
-        filepath = os.path.join(app.config['EXCEL_DIR'], filename)
-        
-        # Save to file
-        wb.save(filepath)
-        
-        logger.info(f"✅ Reports exported to: {filename}")
-        return send_file(filepath, as_attachment=True, download_name=filename)
+        rows = ([log['student_name'], log['sixerclass_id'], log['batch_number'], log['download_time'], log['filename']]
+                for log in download_log.iter_events())
+        return export_response("certificate_reports", "Reports", headers, rows)
         
     except Exception as e:
         logger.error(f"❌ Error exporting reports: {e}")
         return jsonify({"error": "Export failed"}), 500
 
+def download_status_rows():
+    """One row per student with download status, from the per-ID download index"""
+    stats = download_log.stats
+    for student in student_store.all():
+        downloads = stats.get_student(student['sixerclass_id'])
+        has_downloaded = downloads is not None
+        download_count = downloads['download_count'] if downloads else 0
+        last_download = downloads['last_download'] if downloads else None
+        
+        yield [
+            student['student_name'],
+            student['sixerclass_id'],
+            student['batch_number'],
+            student['batch_start_date'],
+            student['batch_end_date'],
+            'Yes' if has_downloaded else 'No',
+            download_count,
+            last_download if last_download else 'Never'
+        ]
+
 @app.route('/admin/api/download-status/export')
 def admin_export_download_status():
     """Export list of students with download status (downloaded/not downloaded)"""
@@ -2445,51 +2686,8 @@ def admin_export_download_status():
         return jsonify({"error": "Unauthorized"}), 401
     
     try:
-        # Get students who have downloaded certificates
-        downloaded_students = set(log['sixerclass_id'] for log in download_logs)
-        
-        # Create workbook and worksheet
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Download Status"
-        
-        # Add headers
         headers = ['Student Name', 'SixerClass ID', 'Batch Number', 'Batch Start Date', 'Batch End Date', 'Certificate Downloaded', 'Download Count', 'Last Download']
-        ws.append(headers)
-        
-        # Add data
-        for student in students_data:
-            has_downloaded = student['sixerclass_id'] in downloaded_students
-            download_count = sum(1 for log in download_logs if log['sixerclass_id'] == student['sixerclass_id'])
-            
-            # Get last download time if exists
-            last_download = None
-            for log in reversed(download_logs):
-                if log['sixerclass_id'] == student['sixerclass_id']:
-                    last_download = log['download_time']
-                    break
-            
-            ws.append([
-                student['student_name'],
-                student['sixerclass_id'],
-                student['batch_number'],
-                student['batch_start_date'],
-                student['batch_end_date'],
-                'Yes' if has_downloaded else 'No',
-                download_count,
-                last_download if last_download else 'Never'
-            ])
-        
-        # Create filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"download_status_{timestamp}.xlsx"
-        filepath = os.path.join(app.config['EXCEL_DIR'], filename)
-        
-        # Save to file
-        wb.save(filepath)
-        
-        logger.info(f"✅ Download status exported to: {filename}")
-        return send_file(filepath, as_attachment=True, download_name=filename)
+        return export_response("download_status", "Download Status", headers, download_status_rows())
         
     except Exception as e:
         logger.error(f"❌ Error exporting download status: {e}")
@@ -2497,5 +2695,7 @@ def admin_export_download_status():
 
 if __name__ == '__main__':
     logger.info("🚀 Starting AWS Training Certificate System - Production Ready")
-    logger.info(f"📊 Loaded {len(students_data)} students")
+    logger.info(f"📊 Loaded {len(student_store)} students")
+    # Turn SIGTERM (docker stop) into a normal exit so atexit handlers run
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
@@ -0,0 +1,232 @@
+import logging
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from template_registry import TemplateRegistry
+
+logger = logging.getLogger(__name__)
+
+ZIP_CHUNK_SIZE = 64 * 1024
+
+# Template registry of a worker process, kept while the parent's templates are unchanged
+_worker_registry = None  # (template_dir, template_options, snapshot, TemplateRegistry)
+
+def _render_certificate(template_dir, template_options, snapshot, student, output_path, issue_date):
+    """(success, template version) for one certificate rendered in a worker"""
+    global _worker_registry
+    # The parent's templates and layouts, not a fresh scan of the directory:
+    # the parent may be serving the last good version of a broken layout
+    if _worker_registry is None or _worker_registry[:3] != (template_dir, template_options, snapshot):
+        registry = TemplateRegistry(template_dir, snapshot=snapshot, **template_options)
+        _worker_registry = (template_dir, template_options, snapshot, registry)
+    registry = _worker_registry[3]
+    version = registry.get_template_version(student)
+    return registry.create_certificate(student, output_path, issue_date=issue_date), version
+
+def default_worker_count():
+    """Number of render processes to use: one per available core"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+class RenderPool:
+    """Worker processes for bulk certificate rendering, shared by every request
+
+    start() forks the workers straight away, so call it before the app
+    starts any thread (a forked child could inherit a lock held by another
+    thread). The workers never import the app; each job carries a snapshot
+    of the parent's templates. Without a running pool (not started, or
+    broken because a worker died) certificates are rendered in this process.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or default_worker_count()
+        self._executor = None
+
+    def start(self):
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context('fork'))
+        # With fork, the first submit launches every worker
+        self._executor.submit(os.getpid).result()
+        logger.info(f"🏭 Started {self.max_workers} certificate render processes")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _broken(self):
+        logger.error("❌ Certificate render processes died, rendering in the app process")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def render(self, registry, jobs):
+        """Render (student, output_path, issue_date) jobs with registry's templates
+
+        Yields (job, success, template version, error) as jobs finish.
+        """
+        jobs = list(jobs)
+        done = set()
+        if self._executor is not None:
+            snapshot = registry.snapshot()
+            futures = {}
+            try:
+                for i, job in enumerate(jobs):
+                    futures[self._executor.submit(_render_certificate, registry.template_dir,
+                                                  registry.template_options, snapshot, *job)] = i
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        success, version = future.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        done.add(i)
+                        yield jobs[i], False, None, str(e)
+                        continue
+                    done.add(i)
+                    yield jobs[i], success, version, None
+            except BrokenProcessPool:
+                self._broken()
+
+        for i, (student, output_path, issue_date) in enumerate(jobs):
+            if i not in done:
+                version = registry.get_template_version(student)
+                success = registry.create_certificate(student, output_path, issue_date=issue_date)
+                yield jobs[i], success, version, None
+
+def generate_certificates(certificate_cache, student_store, render_pool, batch_number=None, sixerclass_ids=None):
+    """Render the certificates of a whole batch or a list of SixerClass IDs in parallel
+
+    Students whose certificate is already cached are not re-rendered; the
+    misses are spread over render_pool (a RenderPool). Returns a summary
+    with per-student results; IDs that are not in student_store are
+    reported as failed. Raises ValueError without a batch_number or
+    sixerclass_ids and LookupError if no student matches.
+    """
+    if not batch_number and not sixerclass_ids:
+        raise ValueError("batch_number or sixerclass_ids required")
+
+    missing_ids = []
+    if batch_number:
+        students = student_store.by_batch(batch_number)
+    else:
+        students = [student_store.get(sid) for sid in sixerclass_ids if sid in student_store]
+        missing_ids = [sid for sid in sixerclass_ids if sid not in student_store]
+    if not students:
+        raise LookupError("No matching students found")
+
+    summary = _generate(certificate_cache, students, render_pool)
+    for sid in missing_ids:
+        summary['results'].append({'sixerclass_id': sid, 'status': 'failed', 'error': 'Student not found'})
+        summary['failed'] += 1
+        summary['total'] += 1
+    return summary
+
+def _generate(certificate_cache, students, render_pool):
+    results = []
+    pending = {}  # output path -> (result, student, filename, issue_date, key)
+
+    for student in students:
+        result = {
+            'sixerclass_id': student['sixerclass_id'],
+            'student_name': student['student_name']
+        }
+        results.append(result)
+        try:
+            filename, issue_date, key, hit = certificate_cache.lookup(student)
+        except Exception as e:
+            result.update({'status': 'failed', 'error': str(e)})
+            continue
+
+        result['filename'] = filename
+        if hit:
+            result['status'] = 'cached'
+        else:
+            pending[os.path.join(certificate_cache.certificate_dir, filename)] = (result, student, filename, issue_date, key)
+
+    rendered = []
+    if pending:
+        registry = certificate_cache.generator
+        logger.info(f"🏭 Rendering {len(pending)} certificates")
+        jobs = [(student, path, issue_date) for path, (_, student, _, issue_date, _) in pending.items()]
+        for (_, path, _), success, version, error in render_pool.render(registry, jobs):
+            result, student, filename, issue_date, key = pending[path]
+            if error is not None:
+                result.update({'status': 'failed', 'error': error})
+            elif success and version != registry.get_template_version(student):
+                # Drawn with a different template file than the cache key
+                # was computed for (it changed on disk meanwhile)
+                result.update({'status': 'failed', 'error': 'Template changed during generation, retry'})
+            elif success:
+                result['status'] = 'generated'
+                rendered.append((student, filename, issue_date, key))
+            else:
+                result.update({'status': 'failed', 'error': 'Certificate generation failed'})
+
+        if rendered:
+            certificate_cache.store_many(rendered)
+
+    summary = {
+        'total': len(results),
+        'generated': sum(1 for r in results if r['status'] == 'generated'),
+        'cached': sum(1 for r in results if r['status'] == 'cached'),
+        'failed': sum(1 for r in results if r['status'] == 'failed'),
+        'results': results
+    }
+    logger.info(f"✅ Bulk generation: {summary['generated']} generated, "
+                f"{summary['cached']} cached, {summary['failed']} failed")
+    return summary
+
+class _ZipStream:
+    """Write-only file object that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_certificates_zip(certificate_cache, students, persist=True):
+    """Yield a ZIP archive of the students' certificates piece by piece
+
+    Each certificate is rendered (or taken from the cache) with
+    get_certificate_bytes(persist=persist) and copied into the archive in
+    small chunks as soon as it is ready, so only one PDF at a time is held
+    in memory, never the archive. PDFs are already compressed, so entries
+    are stored rather than deflated.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for student in students:
+            filename, data = certificate_cache.get_certificate_bytes(student, persist=persist)
+            if data is None:
+                logger.error(f"❌ Skipping certificate in ZIP: {student['sixerclass_id']}")
+                continue
+
+            with archive.open(filename, 'w') as dest:
+                for start in range(0, len(data), ZIP_CHUNK_SIZE):
+                    dest.write(data[start:start + ZIP_CHUNK_SIZE])
+                    chunk = stream.drain()
+                    if chunk:
+                        yield chunk
+            chunk = stream.drain()
+            if chunk:
+                yield chunk
+
+    # Central directory is written when the archive is closed
+    data = stream.drain()
+    if data:
+        yield data
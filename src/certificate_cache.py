@@ -0,0 +1,237 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from werkzeug.utils import secure_filename
+from certificate_generator import LAYOUT_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Student fields that end up on the certificate
+CERTIFICATE_FIELDS = ['student_name', 'batch_number', 'batch_start_date', 'batch_end_date', 'sixerclass_id']
+
+def certificate_filename(student):
+    """File name a student's certificate is stored and served under"""
+    safe_name = secure_filename(student['student_name'].replace(' ', '_'))
+    return f"certificate_{student['sixerclass_id']}_{safe_name}.pdf"
+
+class CertificateCache:
+    """Content-addressed cache of rendered certificates in CERTIFICATE_DIR
+
+    Each sixerclass_id has a row in the certificates table of db_path holding
+    the hash of everything that was drawn (student fields, issue date,
+    template and layout version), the file name and the issue date. A request
+    whose hash matches the row is served from the existing PDF; anything else
+    is re-rendered. Rows are read and written one student at a time, so the
+    cost of a cache miss does not grow with the number of certificates, and
+    SQLite serializes writers across worker processes.
+
+    A student's issue date is fixed the first time it is needed and never
+    changes afterwards, whichever worker renders the certificate.
+    """
+
+    def __init__(self, certificate_dir, generator, db_path):
+        self.certificate_dir = certificate_dir
+        self.generator = generator
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode; transactions are opened explicitly below
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA busy_timeout=5000')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS certificates (
+                sixerclass_id TEXT PRIMARY KEY,
+                cache_key TEXT,
+                filename TEXT,
+                issue_date TEXT
+            )
+        ''')
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def _entry(self, sixerclass_id):
+        with self._lock:
+            row = self._conn.execute('SELECT cache_key, filename, issue_date FROM certificates WHERE sixerclass_id = ?',
+                                     (sixerclass_id,)).fetchone()
+        return row or (None, None, None)
+
+    def cache_key(self, student, issue_date):
+        payload = {field: str(student.get(field, '')) for field in CERTIFICATE_FIELDS}
+        payload['issue_date'] = issue_date
+        payload['template_version'] = self.generator.get_template_version(student)
+        payload['layout_version'] = LAYOUT_VERSION
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def lookup(self, student):
+        """Resolve a student against the index
+
+        Returns (filename, issue_date, key, hit); on a miss the caller renders
+        the certificate with issue_date and then calls store().
+        """
+        filename = certificate_filename(student)
+        stored_key, stored_filename, issue_date = self._entry(student['sixerclass_id'])
+        if not issue_date:
+            # First certificate for this student: fix the issue date now, so
+            # concurrent renders in other workers print the same one
+            issue_date = self.record_issue_date(student['sixerclass_id'], datetime.now().strftime('%Y-%m-%d'))
+        key = self.cache_key(student, issue_date)
+        hit = (stored_key == key and stored_filename == filename and
+               os.path.exists(os.path.join(self.certificate_dir, filename)))
+        return filename, issue_date, key, hit
+
+    def store(self, student, filename, issue_date, key):
+        """Record a freshly rendered certificate, removing one stored under an old name"""
+        self.store_many([(student, filename, issue_date, key)])
+
+    def store_many(self, rendered):
+        """Record several (student, filename, issue_date, key) results in one transaction"""
+        stale_filenames = []
+        with self._transaction():
+            for student, filename, issue_date, key in rendered:
+                row = self._conn.execute('SELECT filename FROM certificates WHERE sixerclass_id = ?',
+                                         (student['sixerclass_id'],)).fetchone()
+                if row and row[0] and row[0] != filename:
+                    stale_filenames.append(row[0])
+                self._conn.execute(
+                    'INSERT INTO certificates (sixerclass_id, cache_key, filename, issue_date) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (sixerclass_id) DO UPDATE SET cache_key = excluded.cache_key, '
+                    'filename = excluded.filename, issue_date = COALESCE(certificates.issue_date, excluded.issue_date)',
+                    (student['sixerclass_id'], key, filename, issue_date))
+        for stale_filename in stale_filenames:
+            self._remove_file(stale_filename)
+
+    def get_certificate(self, student):
+        """Return the certificate file name for student, rendering it only on a cache miss
+
+        Returns None if the certificate could not be generated.
+        """
+        filename, issue_date, key, hit = self.lookup(student)
+        if hit:
+            logger.info(f"✅ Certificate cache hit: {filename}")
+            return filename
+
+        filepath = os.path.join(self.certificate_dir, filename)
+        if not self.generator.create_certificate(student, filepath, issue_date=issue_date):
+            return None
+
+        self.store(student, filename, issue_date, key)
+        return filename
+
+    def get_certificate_bytes(self, student, persist=True):
+        """Return (filename, pdf_bytes) for student without a file round-trip
+
+        Cache hits are read from CERTIFICATE_DIR. Misses are rendered in
+        memory and only written to disk (and indexed) when persist is True;
+        otherwise just the issue date is recorded so a later render prints
+        the same date. pdf_bytes is None if rendering failed.
+        """
+        filename, issue_date, key, hit = self.lookup(student)
+        filepath = os.path.join(self.certificate_dir, filename)
+        if hit:
+            logger.info(f"✅ Certificate cache hit: {filename}")
+            with open(filepath, 'rb') as f:
+                return filename, f.read()
+
+        data = self.generator.render_certificate(student, issue_date=issue_date)
+        if data is None:
+            return filename, None
+
+        if persist:
+            tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, filepath)
+            self.store(student, filename, issue_date, key)
+        else:
+            self.record_issue_date(student['sixerclass_id'], issue_date)
+        return filename, data
+
+    def record_issue_date(self, sixerclass_id, issue_date):
+        """Remember a student's issue date without caching a file
+
+        An already stored date is kept. Returns the stored date.
+        """
+        with self._transaction():
+            self._conn.execute('INSERT INTO certificates (sixerclass_id, issue_date) VALUES (?, ?) '
+                               'ON CONFLICT (sixerclass_id) DO UPDATE SET '
+                               'issue_date = COALESCE(certificates.issue_date, excluded.issue_date)',
+                               (sixerclass_id, issue_date))
+            return self._conn.execute('SELECT issue_date FROM certificates WHERE sixerclass_id = ?',
+                                      (sixerclass_id,)).fetchone()[0]
+
+    def issue_dates(self, students):
+        """Issue dates for students; today is recorded for those never issued
+
+        Recording a date the first time it is printed keeps every later copy
+        (download, ZIP or printed batch) on the same date.
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        ids = [s['sixerclass_id'] for s in students]
+        dates = {}
+        with self._transaction():
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                self._conn.executemany(
+                    'INSERT INTO certificates (sixerclass_id, issue_date) VALUES (?, ?) '
+                    'ON CONFLICT (sixerclass_id) DO UPDATE SET '
+                    'issue_date = COALESCE(certificates.issue_date, excluded.issue_date)',
+                    [(sid, today) for sid in chunk])
+                placeholders = ','.join('?' * len(chunk))
+                dates.update(self._conn.execute(
+                    f'SELECT sixerclass_id, issue_date FROM certificates WHERE sixerclass_id IN ({placeholders})', chunk))
+        return dates
+
+    def invalidate(self, sixerclass_id):
+        """Drop the cached PDF for a student; the stored issue date is kept"""
+        with self._transaction():
+            row = self._conn.execute('SELECT cache_key, filename FROM certificates WHERE sixerclass_id = ?',
+                                     (sixerclass_id,)).fetchone()
+            if not row or row[0] is None:
+                return
+            self._conn.execute('UPDATE certificates SET cache_key = NULL, filename = NULL WHERE sixerclass_id = ?',
+                               (sixerclass_id,))
+        self._remove_file(row[1])
+        logger.info(f"🗑️ Invalidated cached certificate for: {sixerclass_id}")
+
+    def rename(self, old_id, new_id):
+        """Move a student's row to a changed sixerclass_id
+
+        The new ID keeps the issue date; a cached PDF of either ID is dropped.
+        """
+        if old_id == new_id:
+            return
+        with self._transaction():
+            rows = dict(self._conn.execute('SELECT sixerclass_id, filename FROM certificates WHERE sixerclass_id IN (?, ?)',
+                                           (old_id, new_id)).fetchall())
+            if old_id not in rows:
+                return
+            self._conn.execute('DELETE FROM certificates WHERE sixerclass_id = ?', (new_id,))
+            self._conn.execute('UPDATE certificates SET sixerclass_id = ?, cache_key = NULL, filename = NULL '
+                               'WHERE sixerclass_id = ?', (new_id, old_id))
+        for filename in rows.values():
+            self._remove_file(filename)
+        logger.info(f"🔄 Moved certificate record {old_id} -> {new_id}")
+
+    def _remove_file(self, filename):
+        if not filename:
+            return
+        try:
+            os.remove(os.path.join(self.certificate_dir, filename))
+        except FileNotFoundError:
+            pass
@@ -1,17 +1,63 @@
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfdoc
+import copy
+import hashlib
 import os
+import threading
+import weakref
+from collections import OrderedDict
 from datetime import datetime
+from io import BytesIO
 from PIL import Image
+from template_optimizer import optimize_template, DEFAULT_QUALITY
+from compiled_certificate import CompiledCertificate
+from certificate_layout import Layout
+
+try:
+    from pdfrw import PdfReader, PdfDict, PdfArray
+    from pdfrw.buildxobj import pagexobj
+    from pdfrw.toreportlab import makerl
+except ImportError:  # in requirements.txt; PDF templates are skipped if it is missing
+    PdfReader = None
+
+# Bump whenever create_certificate draws something different, so cached
+# certificates rendered with the old layout are regenerated
+LAYOUT_VERSION = 1
+
+# Rendered batch layers kept by the precompiled path (least recently used go first)
+MAX_BATCH_LAYERS = 1024
+
+TEMPLATE_NAMES = ('certificate-template.pdf', 'certificate-template.png')
+
+def template_supported(path):
+    """False (with a warning) for a PDF template when pdfrw is not installed"""
+    if not path.lower().endswith('.pdf'):
+        return True
+    if PdfReader is None:
+        print(f"❌ Skipping PDF template {path}: install pdfrw to use PDF templates")
+        return False
+    return True
 
 class CertificateGenerator:
-    def __init__(self, template_dir=None):
-        # Use provided template directory or try to find it
-        if template_dir:
-            self.template_path = os.path.join(template_dir, 'certificate-template.png')
+    def __init__(self, template_dir=None, optimize=False, quality=DEFAULT_QUALITY, dpi=None,
+                 template_path=None, layout=None):
+        # Use the given template, the one in the provided template directory or try to find it
+        if template_path:
+            self.template_path = template_path
+        elif template_dir:
+            # A vector (PDF) template wins over the raster one
+            possible_paths = [os.path.join(template_dir, name) for name in TEMPLATE_NAMES]
+            self.template_path = possible_paths[-1]
+            for path in possible_paths:
+                if os.path.exists(path) and template_supported(path):
+                    self.template_path = path
+                    break
         else:
             # Try multiple template paths for backward compatibility
             possible_paths = [
+                'data/templates/certificate-template.pdf',
+                '../data/templates/certificate-template.pdf',
                 'data/templates/certificate-template.png',
                 '../data/templates/certificate-template.png',
                 'aws-final-deployment/certificate-templates/raw/certificate-template.png',
@@ -21,15 +67,167 @@ class CertificateGenerator:
             
             self.template_path = None
             for path in possible_paths:
-                if os.path.exists(path):
+                if os.path.exists(path) and template_supported(path):
                     self.template_path = path
                     break
         
+        self.template_is_pdf = bool(self.template_path) and self.template_path.lower().endswith('.pdf')
+        
+        # Where the text goes (see certificate_layout); the built-in layout by default
+        self.layout = layout or Layout()
+        
+        # With optimize, PDFs embed a JPEG derivative of a raster template (see template_optimizer)
+        self.template_options = {'optimize': optimize, 'quality': quality, 'dpi': dpi}
+        
+        # Decoded template cache, filled lazily by _load_template()
+        self._template_lock = threading.Lock()
+        self._template_image = None
+        self._template_size = None
+        self._template_stat = None
+        self.template_version = None
+        self._compiled = None
+        
+        # (batch_number, start, end) -> encoded batch text, see _batch_layer()
+        self._batch_layers = OrderedDict()
+        self._batch_layers_lock = threading.Lock()
+        
         if not self.template_path or not os.path.exists(self.template_path):
             print("❌ Certificate template not found!")
         else:
             print(f"✅ Using template: {self.template_path}")
     
+    def _load_template(self):
+        """Decode the template once and keep a ready-to-embed image XObject"""
+        if self._template_image is not None:
+            return self._template_image
+        
+        with self._template_lock:
+            if self._template_image is None:
+                st = os.stat(self.template_path)
+                self._template_stat = (st.st_mtime_ns, st.st_size)
+                if self.template_is_pdf:
+                    self._load_pdf_template()
+                    return self._template_image
+                
+                embed_path = self.template_path
+                if self.template_options['optimize']:
+                    try:
+                        embed_path = optimize_template(self.template_path, quality=self.template_options['quality'],
+                                                       dpi=self.template_options['dpi'])
+                    except Exception as e:
+                        print(f"❌ Template optimization failed, embedding original: {e}")
+                
+                # Hash of what is embedded, so changing the optimization settings
+                # also invalidates cached certificates
+                with open(embed_path, 'rb') as f:
+                    self.template_version = hashlib.sha256(f.read()).hexdigest()[:16]
+                
+                # PDFImageXObject decodes and Flate-compresses the pixels up front
+                # (a JPEG is passed through as-is), so every canvas can reference
+                # the same compressed stream
+                image = pdfdoc.PDFImageXObject('template-' + self.template_version, embed_path)
+                if image._filters == ('ASCII85Decode', 'DCTDecode'):
+                    # Embed the JPEG bytes in binary rather than ASCII85 (+25%)
+                    with open(embed_path, 'rb') as f:
+                        image.streamContent = f.read()
+                    image._filters = ('DCTDecode',)
+                # The page keeps the source's size whatever resolution is embedded
+                with Image.open(self.template_path) as source:
+                    self._template_size = source.size
+                self._template_image = image
+                print(f"✅ Template cached: {embed_path} ({image.width}x{image.height})")
+        
+        return self._template_image
+    
+    def _load_pdf_template(self):
+        """Import page 1 of a PDF template once as a form XObject (caller holds the lock)"""
+        with open(self.template_path, 'rb') as f:
+            data = f.read()
+        self.template_version = hashlib.sha256(data).hexdigest()[:16]
+        form = pagexobj(PdfReader(fdata=data).pages[0])
+        
+        # pdfrw remembers the converted objects per reportlab document on every
+        # object of the form; weak keys let those entries go with each document
+        seen = set()
+        stack = [form]
+        while stack:
+            obj = stack.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            if isinstance(obj, PdfDict):
+                obj.private.derived_rl_obj = weakref.WeakKeyDictionary()
+                stack.extend(obj.values())
+            elif isinstance(obj, PdfArray):
+                obj.derived_rl_obj = weakref.WeakKeyDictionary()
+                stack.extend(obj)
+        
+        x0, y0, x1, y1 = [float(v) for v in form.BBox]
+        self._template_size = (x1 - x0, y1 - y0)
+        self._template_image = form
+        print(f"✅ Template cached: {self.template_path} (vector, {x1 - x0:g}x{y1 - y0:g} pt)")
+    
+    def reload_template(self):
+        """Drop the cached template so the next render picks up a new file"""
+        with self._template_lock:
+            self._template_image = None
+            self._template_size = None
+            self._template_stat = None
+            self.template_version = None
+            self._compiled = None
+        self.evict_batch_layers()
+    
+    def get_template_version(self, check_file=True):
+        """Content hash of the current template, reloading it if the file was swapped
+        
+        check_file=False skips the stat for callers that watch the file themselves.
+        """
+        if not self.template_path:
+            return None
+        if check_file:
+            if not os.path.exists(self.template_path):
+                return None
+            st = os.stat(self.template_path)
+        if check_file and self._template_stat and self._template_stat != (st.st_mtime_ns, st.st_size):
+            print(f"🔄 Template changed on disk, reloading: {self.template_path}")
+            self.reload_template()
+        self._load_template()
+        return self.template_version
+    
+    def _draw_template(self, c, width, height):
+        """Draw the cached template XObject onto canvas c at full page size"""
+        image = self._load_template()
+        if self.template_is_pdf:
+            # makerl converts the form for this document once and then
+            # returns the name it is registered under
+            with self._template_lock:
+                name = makerl(c, image)
+            x0, y0, x1, y1 = [float(v) for v in image.BBox]
+            c.saveState()
+            c.scale(width / (x1 - x0), height / (y1 - y0))
+            c.translate(-x0, -y0)
+            c.doForm(name)
+            c.restoreState()
+            return
+        
+        doc = c._doc
+        reg_name = doc.getXObjectName(image.name)
+        if reg_name not in doc.idToObject:
+            # Shallow copy: the compressed pixel stream is shared, but each
+            # document registers its own object wrapper. Later pages of the
+            # same document reference the already registered object.
+            image = copy.copy(image)
+            c._setXObjects(image)
+            doc.Reference(image, reg_name)
+            doc.addForm(image.name, image)
+        
+        c._currentPageHasImages = 1
+        c.saveState()
+        c.scale(width, height)
+        c._code.append("/%s Do" % reg_name)
+        c.restoreState()
+        c._formsinuse.append(image.name)
+    
     def format_date(self, date_str):
         """Convert date to dd-mm-yyyy format"""
         try:
@@ -43,13 +241,117 @@ class CertificateGenerator:
         
     def get_image_dimensions(self):
         """Get original image dimensions"""
+        if self._template_size:
+            return self._template_size
         if self.template_path and os.path.exists(self.template_path):
-            with Image.open(self.template_path) as img:
-                return img.size  # (width, height)
+            self._load_template()
+            return self._template_size  # (width, height)
         return (1056, 816)  # Default dimensions
         
-    def create_certificate(self, student_data, output_path):
-        """Create PDF certificate with template overlay"""
+    def _batch_values(self, student_data):
+        """Placeholder values shared by the student's batch (dates in dd-mm-yyyy format)"""
+        return {
+            'batch_number': student_data['batch_number'],
+            'batch_start_date': self.format_date(student_data['batch_start_date']),
+            'batch_end_date': self.format_date(student_data['batch_end_date'])
+        }
+    
+    def _student_values(self, student_data, issue_date=None):
+        """All placeholder values for the student's certificate"""
+        values = self._batch_values(student_data)
+        values['student_name'] = student_data['student_name']
+        values['sixerclass_id'] = student_data['sixerclass_id']
+        values['issue_date'] = self.format_date(issue_date) if issue_date else datetime.now().strftime('%d-%m-%Y')
+        return values
+    
+    def _text_items(self, student_data, issue_date=None):
+        """All text of a certificate as (font, size, x, y, text), batch layer first"""
+        return (self.layout.batch_items(self._batch_values(student_data)) +
+                self.layout.student_items(self._student_values(student_data, issue_date)))
+    
+    def _text_scale(self, img_width, img_height):
+        """Scale from layout coordinates to the page"""
+        return (img_width / self.layout.size[0], img_height / self.layout.size[1])
+    
+    def _draw_certificate_page(self, c, student_data, img_width, img_height, issue_date=None):
+        """Draw the template and one student's text onto the current page of c"""
+        # Draw cached template image at exact size
+        self._draw_template(c, img_width, img_height)
+        
+        c.saveState()
+        # Text coordinates are in layout units
+        c.scale(*self._text_scale(img_width, img_height))
+        c.setFillColorRGB(0, 0, 0)  # Black text
+        for font, size, x, y, text in self._text_items(student_data, issue_date):
+            c.setFont(font, size)
+            c.drawString(x, y, text)
+        c.restoreState()
+    
+    def _get_compiled(self):
+        """The precompiled certificate PDF for the current template, built on first use"""
+        self._load_template()
+        compiled = self._compiled
+        if compiled is None or compiled.template_version != self.template_version:
+            img_width, img_height = self.get_image_dimensions()
+            buffer = BytesIO()
+            c = canvas.Canvas(buffer, pagesize=(img_width, img_height), invariant=1)
+            self._draw_template(c, img_width, img_height)
+            font_names = {font: c._doc.getInternalFontName(font)[1:] for font in self.layout.fonts}
+            c.showPage()
+            c.save()
+            compiled = self._compiled = CompiledCertificate(buffer.getvalue(), font_names,
+                                                            self._text_scale(img_width, img_height),
+                                                            template_version=self.template_version)
+            # Layers are encoded with the font names of the previous build
+            self.evict_batch_layers()
+            print(f"✅ Certificate PDF precompiled ({len(buffer.getvalue()):,} bytes)")
+        return compiled
+    
+    def _batch_layer(self, compiled, student_data):
+        """Encoded batch text (dates and batch label) for student_data's batch, cached per batch and dates"""
+        key = (student_data['batch_number'], student_data['batch_start_date'], student_data['batch_end_date'])
+        with self._batch_layers_lock:
+            layer = self._batch_layers.get(key)
+            if layer is not None:
+                self._batch_layers.move_to_end(key)
+                return layer
+        
+        layer = compiled.text_ops(self.layout.batch_items(self._batch_values(student_data)))
+        with self._batch_layers_lock:
+            self._batch_layers[key] = layer
+            if len(self._batch_layers) > MAX_BATCH_LAYERS:
+                self._batch_layers.popitem(last=False)
+        return layer
+    
+    def evict_batch_layers(self, batch_numbers=None):
+        """Forget cached batch layers of the given batches (default: all)
+        
+        Layers are keyed by their dates too, so an edited batch never gets an
+        outdated layer; evicting just frees the old entries right away.
+        """
+        with self._batch_layers_lock:
+            if batch_numbers is None:
+                self._batch_layers.clear()
+                return
+            batch_numbers = set(batch_numbers)
+            for key in [key for key in self._batch_layers if key[0] in batch_numbers]:
+                del self._batch_layers[key]
+    
+    def _render_compiled(self, student_data, issue_date=None):
+        """PDF bytes from the precompiled certificate, or None if reportlab has to draw it"""
+        try:
+            compiled = self._get_compiled()
+            return compiled.render(self.layout.student_items(self._student_values(student_data, issue_date)),
+                                   layers=(self._batch_layer(compiled, student_data),))
+        except UnicodeEncodeError:
+            # Characters outside WinAnsiEncoding need reportlab's font handling
+            return None
+    
+    def create_certificate(self, student_data, output_path, issue_date=None):
+        """Create PDF certificate with template overlay
+        
+        issue_date (YYYY-MM-DD) is printed as the "Issued" date; today is used when omitted.
+        """
         try:
             if not self.template_path:
                 print("❌ No template available")
@@ -57,51 +359,94 @@ class CertificateGenerator:
                 
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
             
-            # Get image dimensions
-            img_width, img_height = self.get_image_dimensions()
-            
-            # Create PDF with exact image dimensions
-            custom_page_size = (img_width, img_height)
-            c = canvas.Canvas(output_path, pagesize=custom_page_size)
-            
-            # Draw template image at exact size
-            c.drawImage(self.template_path, 0, 0, width=img_width, height=img_height)
+            # Written next to output_path and renamed over it, so a request
+            # reading the previous version never sees a half-written file
+            tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                data = self._render_compiled(student_data, issue_date)
+                if data is not None:
+                    with open(tmp_path, 'wb') as f:
+                        f.write(data)
+                else:
+                    # Get image dimensions
+                    img_width, img_height = self.get_image_dimensions()
+                    
+                    # Create PDF with exact image dimensions
+                    custom_page_size = (img_width, img_height)
+                    c = canvas.Canvas(tmp_path, pagesize=custom_page_size)
+                    
+                    self._draw_certificate_page(c, student_data, img_width, img_height, issue_date)
+                    
+                    c.save()
+                os.replace(tmp_path, output_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            print(f"✅ Template-based certificate created: {output_path}")
+            return True
             
-            # Dynamic center alignment for student name
-            name_font_size = 32
-            c.setFont("Helvetica-Bold", name_font_size)
-            c.setFillColorRGB(0, 0, 0)  # Black text
+        except Exception as e:
+            print(f"❌ Certificate generation error: {e}")
+            return False
+    
+    def render_certificate(self, student_data, issue_date=None):
+        """Render a certificate in memory and return the PDF bytes (None on failure)"""
+        try:
+            if not self.template_path:
+                print("❌ No template available")
+                return None
             
-            # Define name area boundaries (matching your underlined space)
-            name_start_x = 269   # Left boundary of underlined space
-            name_end_x = 1280    # Right boundary of underlined space
-            name_y = 600         # Y position
+            data = self._render_compiled(student_data, issue_date)
+            if data is not None:
+                return data
             
-            # Calculate center position for name
-            name_text = student_data['student_name'].upper()
-            name_width = c.stringWidth(name_text, "Helvetica-Bold", name_font_size)
-            name_center_x = name_start_x + (name_end_x - name_start_x - name_width) / 2
+            img_width, img_height = self.get_image_dimensions()
+            buffer = BytesIO()
+            c = canvas.Canvas(buffer, pagesize=(img_width, img_height))
+            self._draw_certificate_page(c, student_data, img_width, img_height, issue_date)
+            c.save()
+            return buffer.getvalue()
             
-            # Draw centered name
-            c.drawString(name_center_x, name_y, name_text)
+        except Exception as e:
+            print(f"❌ Certificate generation error: {e}")
+            return None
+    
+    def render_batch_certificate(self, students, issue_dates=None):
+        """Render one multi-page PDF with a certificate page per student and return its bytes
+        
+        The template image is stored once in the document and referenced by
+        every page. issue_dates optionally maps sixerclass_id to YYYY-MM-DD.
+        Returns None on failure.
+        """
+        try:
+            if not self.template_path:
+                print("❌ No template available")
+                return None
             
-            # Dates at perfect positions with dd-mm-yyyy format
-            c.setFont("Helvetica", 26)
-            start_date = self.format_date(student_data['batch_start_date'])
-            end_date = self.format_date(student_data['batch_end_date'])
-            c.drawString(565, 418, start_date)
-            c.drawString(965, 418, end_date)
+            issue_dates = issue_dates or {}
+            img_width, img_height = self.get_image_dimensions()
+            buffer = BytesIO()
+            c = canvas.Canvas(buffer, pagesize=(img_width, img_height))
             
-            # Additional info
-            c.setFont("Helvetica", 12)
-            c.drawString(50, 50, f"Batch: {student_data['batch_number']}")
-            c.drawString(50, 35, f"ID: {student_data['sixerclass_id']}")
-            c.drawString(400, 35, f"Issued: {datetime.now().strftime('%d-%m-%Y')}")
+            for student_data in students:
+                issue_date = issue_dates.get(student_data['sixerclass_id'])
+                self._draw_certificate_page(c, student_data, img_width, img_height, issue_date)
+                c.showPage()
             
             c.save()
-            print(f"✅ Template-based certificate created: {output_path}")
-            return True
+            return buffer.getvalue()
             
         except Exception as e:
-            print(f"❌ Certificate generation error: {e}")
-            return False
\ No newline at end of file
+            print(f"❌ Batch certificate generation error: {e}")
+            return None
+    
+    def create_batch_certificate(self, students, output_path, issue_dates=None):
+        """Create one multi-page PDF with a certificate page per student (see render_batch_certificate)"""
+        data = self.render_batch_certificate(students, issue_dates)
+        if data is None:
+            return False
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, 'wb') as f:
+            f.write(data)
+        print(f"✅ Batch certificate created: {output_path} ({len(students)} pages)")
+        return True
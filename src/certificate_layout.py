@@ -0,0 +1,114 @@
+"""Certificate text layouts and their JSON definitions.
+
+A layout is the page size its coordinates were measured on plus a list of
+text fields:
+
+    {
+        "size": [1594, 1232],
+        "fields": [
+            {"text": "{student_name}", "upper": true, "font": "Helvetica-Bold", "size": 32,
+             "x": 269, "x_end": 1280, "align": "center", "y": 600},
+            {"text": "Batch: {batch_number}", "font": "Helvetica", "size": 12, "x": 50, "y": 50}
+        ]
+    }
+
+"text" may use the PLACEHOLDERS below; dates are printed as dd-mm-yyyy.
+"align" is left (default, starting at x), right (ending at x) or center
+(between x and x_end). Fonts are the standard PDF fonts.
+"""
+import hashlib
+import json
+import string
+from reportlab.pdfbase import pdfmetrics
+
+PLACEHOLDERS = ('student_name', 'batch_number', 'batch_start_date', 'batch_end_date', 'sixerclass_id', 'issue_date')
+
+# Fields using only these are the same for a whole batch
+BATCH_PLACEHOLDERS = ('batch_number', 'batch_start_date', 'batch_end_date')
+
+ALIGNMENTS = ('left', 'center', 'right')
+
+# The layout of data/templates/certificate-template.png, used for templates
+# without a layout file
+DEFAULT_LAYOUT = {
+    'size': [1594, 1232],
+    'fields': [
+        # Name centered in the underlined space
+        {'text': '{student_name}', 'upper': True, 'font': 'Helvetica-Bold', 'size': 32,
+         'x': 269, 'x_end': 1280, 'align': 'center', 'y': 600},
+        {'text': '{batch_start_date}', 'font': 'Helvetica', 'size': 26, 'x': 565, 'y': 418},
+        {'text': '{batch_end_date}', 'font': 'Helvetica', 'size': 26, 'x': 965, 'y': 418},
+        {'text': 'Batch: {batch_number}', 'font': 'Helvetica', 'size': 12, 'x': 50, 'y': 50},
+        {'text': 'ID: {sixerclass_id}', 'font': 'Helvetica', 'size': 12, 'x': 50, 'y': 35},
+        {'text': 'Issued: {issue_date}', 'font': 'Helvetica', 'size': 12, 'x': 400, 'y': 35}
+    ]
+}
+
+class _Field:
+    def __init__(self, spec):
+        self.text = spec['text']
+        self.font = spec['font']
+        self.size = float(spec['size'])
+        self.x = float(spec['x'])
+        self.y = float(spec['y'])
+        self.x_end = float(spec['x_end']) if 'x_end' in spec else None
+        self.align = spec.get('align', 'left')
+        self.upper = bool(spec.get('upper', False))
+
+        names = {name for _, name, _, _ in string.Formatter().parse(self.text) if name is not None}
+        unknown = names - set(PLACEHOLDERS)
+        if unknown:
+            raise ValueError(f"Unknown placeholder(s) {', '.join(sorted(unknown))} in {self.text!r}")
+        if self.align not in ALIGNMENTS:
+            raise ValueError(f"Unknown align {self.align!r}")
+        if self.align == 'center' and self.x_end is None:
+            raise ValueError(f"Centered field {self.text!r} needs x_end")
+        try:
+            pdfmetrics.getFont(self.font)
+        except KeyError:
+            raise ValueError(f"Unknown font {self.font!r}")
+        self.batch_only = names <= set(BATCH_PLACEHOLDERS)
+
+    def item(self, values):
+        text = self.text.format(**values)
+        if self.upper:
+            text = text.upper()
+        x = self.x
+        if self.align != 'left':
+            width = pdfmetrics.stringWidth(text, self.font, self.size)
+            x = self.x - width if self.align == 'right' else self.x + (self.x_end - self.x - width) / 2
+        return (self.font, self.size, x, self.y, text)
+
+class Layout:
+    """A layout compiled into a render plan
+
+    Fields are validated and split once into the batch layer (fields that
+    only use batch placeholders) and the per-student fields. digest changes
+    whenever the definition does.
+    """
+
+    def __init__(self, definition=None):
+        definition = definition or DEFAULT_LAYOUT
+        self.definition = definition
+        try:
+            self.size = (float(definition['size'][0]), float(definition['size'][1]))
+            fields = [_Field(spec) for spec in definition['fields']]
+        except (KeyError, IndexError, TypeError) as e:
+            raise ValueError(f"Invalid layout: {e!r}")
+        self.batch_fields = [field for field in fields if field.batch_only]
+        self.student_fields = [field for field in fields if not field.batch_only]
+        self.fonts = tuple(sorted({field.font for field in fields}))
+        self.digest = hashlib.sha256(json.dumps(definition, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def batch_items(self, values):
+        """(font, size, x, y, text) of the batch layer; values needs the batch placeholders"""
+        return [field.item(values) for field in self.batch_fields]
+
+    def student_items(self, values):
+        """(font, size, x, y, text) of the per-student fields; values needs every placeholder"""
+        return [field.item(values) for field in self.student_fields]
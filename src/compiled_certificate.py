@@ -0,0 +1,87 @@
+"""Certificates rendered by splicing text into a precompiled PDF.
+
+Every certificate shares the template XObject, the fonts and the page; only
+a few strings differ. CompiledCertificate takes one reportlab-built PDF
+holding the shared part, splits it into objects once, and points the page at
+a second content stream appended as the last object. Rendering a
+certificate is then those fixed bytes, a small text content stream and a
+new xref table, with no canvas and no PDF serialization.
+"""
+import hashlib
+import re
+from reportlab.lib.rl_accel import fp_str
+
+XREF_ENTRY = re.compile(rb'(\d{10}) \d{5} n')
+PAGE_CONTENTS = re.compile(rb'/Contents (\d+) 0 R')
+
+def _pdf_string(text):
+    """text as a PDF literal string for the standard fonts (WinAnsiEncoding)
+
+    Raises UnicodeEncodeError for text those fonts cannot show.
+    """
+    data = text.encode('cp1252')
+    data = data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'\\r')
+    return b'(' + data + b')'
+
+class CompiledCertificate:
+    """A one-page PDF (skeleton) that certificates are stamped from
+
+    font_names maps the fonts used by the text to their resource names in
+    the skeleton (e.g. 'Helvetica' -> 'F1'). scale is applied to the text
+    coordinates. template_version is the template the skeleton was built
+    from.
+    """
+
+    def __init__(self, skeleton, font_names, scale=(1, 1), template_version=None):
+        self.font_names = font_names
+        self.scale = scale
+        self.template_version = template_version
+
+        startxref = int(skeleton[skeleton.rindex(b'startxref') + 9:].split()[0])
+        offsets = [int(offset) for offset in XREF_ENTRY.findall(skeleton, startxref)]
+        bounds = offsets + [startxref]
+        objects = [skeleton[bounds[i]:bounds[i + 1]] for i in range(len(offsets))]
+        trailer = skeleton[skeleton.index(b'trailer', startxref):]
+        root = re.search(rb'/Root (\d+ 0 R)', trailer).group(1)
+        info = re.search(rb'/Info (\d+ 0 R)', trailer).group(1)
+
+        # The text stream becomes the last object; the page draws it after
+        # the static content
+        self._text_object = len(objects) + 1
+        pages = [i for i, obj in enumerate(objects) if re.search(rb'/Type /Page\s', obj)]
+        if len(pages) != 1:
+            raise ValueError(f"Expected a one-page skeleton, found {len(pages)} pages")
+        objects[pages[0]] = PAGE_CONTENTS.sub(
+            lambda m: b'/Contents [ %s 0 R %d 0 R ]' % (m.group(1), self._text_object), objects[pages[0]], count=1)
+
+        prefix = [skeleton[:offsets[0]]]
+        xref = [b'xref\n0 %d\n0000000000 65535 f \n' % (self._text_object + 1)]
+        position = len(prefix[0])
+        for obj in objects:
+            xref.append(b'%010d 00000 n \n' % position)
+            prefix.append(obj)
+            position += len(obj)
+        self._prefix = b''.join(prefix)
+        self._xref = b''.join(xref)
+        self._text_header = b'q\n%s 0 0 %s 0 0 cm\n0 0 0 rg\n' % (fp_str(scale[0]).encode(), fp_str(scale[1]).encode())
+        self._trailer_refs = b'/Info %s /Root %s /Size %d' % (info, root, self._text_object + 1)
+
+    def text_ops(self, items):
+        """Content stream operators drawing the (font, size, x, y, text) items
+
+        The result can be cached and passed to render() as a layer.
+        """
+        return b''.join(b'BT /%s %s Tf 1 0 0 1 %s Tm %s Tj ET\n' % (
+            self.font_names[font].encode(), fp_str(size).encode(), fp_str(x, y).encode(), _pdf_string(text))
+            for font, size, x, y, text in items)
+
+    def render(self, items, layers=()):
+        """PDF bytes with the layers (from text_ops) and then items drawn over the skeleton"""
+        content = b''.join((self._text_header, *layers, self.text_ops(items), b'Q'))
+        text_object = b'%d 0 obj\n<< /Length %d >>\nstream\n%s\nendstream\nendobj\n' % (
+            self._text_object, len(content), content)
+        doc_id = hashlib.md5(content).hexdigest().encode()
+        trailer = b'trailer\n<< /ID [<%s><%s>] %s >>\nstartxref\n%d\n%%%%EOF\n' % (
+            doc_id, doc_id, self._trailer_refs, len(self._prefix) + len(text_object))
+        return b''.join((self._prefix, text_object, self._xref,
+                         b'%010d 00000 n \n' % len(self._prefix), trailer))
@@ -0,0 +1,91 @@
+import gzip
+import hashlib
+import logging
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # in requirements.txt; gzip only if it is missing
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Smaller dynamic responses are not worth the CPU (or the extra header bytes)
+COMPRESS_MIN_SIZE = 1024
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/css', 'application/javascript', 'text/csv')
+
+def _encodings():
+    return ['br', 'gzip'] if brotli else ['gzip']
+
+def negotiate_encoding(request):
+    """Best content coding the client accepts: br, gzip or identity"""
+    return request.accept_encodings.best_match(_encodings(), default='identity')
+
+def compress(data, encoding, static=False):
+    """data compressed with encoding; static (done once) uses the highest levels"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if static else 5)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9 if static else 6, mtime=0)
+    return data
+
+class PrecompressedPage:
+    """A fixed page, compressed once and served with content negotiation
+
+    Every encoding gets its own strong ETag (content hash plus encoding), so
+    browsers revalidate with If-None-Match and get a bodiless 304 while
+    the page is unchanged.
+    """
+
+    def __init__(self, body, mimetype='text/html', cache_control='no-cache'):
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        digest = hashlib.sha256(data).hexdigest()[:20]
+        self._variants = {'identity': (data, digest)}
+        for encoding in _encodings():
+            self._variants[encoding] = (compress(data, encoding, static=True), f'{digest}-{encoding}')
+        sizes = ', '.join(f'{enc} {len(variant[0])}' for enc, variant in self._variants.items())
+        logger.info(f"✅ Precompressed page ({sizes} bytes)")
+
+    def response(self, request):
+        encoding = negotiate_encoding(request)
+        data, etag = self._variants[encoding]
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(data, mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = self.cache_control
+        response.vary.add('Accept-Encoding')
+        return response
+
+def compress_response(request, response):
+    """Compress a large dynamic response (JSON and friends) if the client accepts it
+
+    Meant for after_request. Streamed, already encoded, partial and small
+    responses are passed through untouched. A strong ETag is weakened,
+    since the compressed bytes differ from the ones it was computed for.
+    """
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+    encoding = negotiate_encoding(request)
+    if encoding == 'identity':
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,243 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+class DownloadStats:
+    """Download aggregates maintained in O(1) per event
+
+    Keeps the total, per-student counters and last download time (the keys
+    are the distinct-student set) and per-batch totals, so reports never
+    need to walk the log.
+    """
+
+    SORT_KEYS = ('download_count', 'last_download', 'student_name', 'sixerclass_id', 'batch_number')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total_downloads = 0
+        self.student_downloads = {}  # sixerclass_id -> per-student summary
+        self.batch_downloads = {}    # batch_number -> per-batch totals
+
+    def add(self, event):
+        sid = event['sixerclass_id']
+        with self._lock:
+            self.total_downloads += 1
+            entry = self.student_downloads.get(sid)
+            first_download = entry is None
+            if first_download:
+                entry = self.student_downloads[sid] = {
+                    'student_name': event['student_name'],
+                    'sixerclass_id': sid,
+                    'batch_number': event['batch_number'],
+                    'download_count': 0,
+                    'last_download': event['download_time']
+                }
+            entry['download_count'] += 1
+            if event['download_time'] > entry['last_download']:
+                entry['last_download'] = event['download_time']
+
+            batch = self.batch_downloads.get(event['batch_number'])
+            if batch is None:
+                batch = self.batch_downloads[event['batch_number']] = {
+                    'batch_number': event['batch_number'],
+                    'download_count': 0,
+                    'unique_students': 0
+                }
+            batch['download_count'] += 1
+            if first_download:
+                batch['unique_students'] += 1
+
+    @property
+    def unique_students(self):
+        return len(self.student_downloads)
+
+    def get_student(self, sixerclass_id):
+        entry = self.student_downloads.get(sixerclass_id)
+        return dict(entry) if entry else None
+
+    def students(self, sort=None, descending=True, offset=0, limit=None):
+        """Copy of per-student summaries, optionally sorted and paginated
+
+        A sorted first page (offset 0 with a limit) is a top-N selection
+        rather than a full sort.
+        """
+        with self._lock:
+            entries = self.student_downloads.values()
+            if sort:
+                key = lambda e: e[sort]
+                if offset == 0 and limit is not None:
+                    pick = heapq.nlargest if descending else heapq.nsmallest
+                    entries = pick(limit, entries, key=key)
+                else:
+                    entries = sorted(entries, key=key, reverse=descending)
+            end = None if limit is None else offset + limit
+            return [dict(e) for e in itertools.islice(entries, offset, end)]
+
+    def batches(self):
+        with self._lock:
+            return [dict(b) for b in self.batch_downloads.values()]
+
+class DownloadLog:
+    """Durable, append-only log of certificate downloads
+
+    Events are appended as JSON lines to numbered segment files in log_dir
+    (downloads-000001.jsonl, ...). A segment that reaches segment_size is
+    closed and the next one started. Writes go straight to the OS with
+    O_APPEND, so worker processes can share the directory; a background
+    thread fsyncs at most every fsync_interval seconds instead of on every
+    download.
+
+    On start-up every segment is replayed once into stats, and refresh()
+    then tails only what was appended since (by this or another worker).
+    Raw events are not kept in memory; iter_events() streams them from disk.
+    """
+
+    SEGMENT_PATTERN = re.compile(r'^downloads-(\d{6})\.jsonl$')
+
+    def __init__(self, log_dir, segment_size=8 * 1024 * 1024, fsync_interval=1.0):
+        self.log_dir = log_dir
+        self.segment_size = segment_size
+        self.fsync_interval = fsync_interval
+        self.stats = DownloadStats()
+        self._lock = threading.Lock()
+        self._read_lock = threading.Lock()
+        self._write_fd = None
+        self._write_segment = None
+        self._unsynced = False
+        self._closed = threading.Event()
+        os.makedirs(log_dir, exist_ok=True)
+
+        segments = self._segments()
+        self._read_segment = segments[0] if segments else 1
+        self._read_offset = 0
+        self._previous_segment = None
+        self._previous_offset = 0
+        self.refresh()
+        logger.info(f"✅ Replayed {self.stats.total_downloads} downloads from {len(segments)} log segments")
+
+        self._flusher = threading.Thread(target=self._run_flusher, name='download-log-fsync', daemon=True)
+        self._flusher.start()
+
+    def _segment_path(self, number):
+        return os.path.join(self.log_dir, f'downloads-{number:06d}.jsonl')
+
+    def _segments(self):
+        numbers = []
+        for name in os.listdir(self.log_dir):
+            match = self.SEGMENT_PATTERN.match(name)
+            if match:
+                numbers.append(int(match.group(1)))
+        return sorted(numbers)
+
+    def _open_segment(self):
+        """Return an fd for the segment to append to, rotating when it is full
+
+        Appends always go to the newest segment: once another worker (maybe
+        with a different segment size) has started the next one, this one is
+        left alone.
+        """
+        if (self._write_fd is not None and os.fstat(self._write_fd).st_size < self.segment_size
+                and not os.path.exists(self._segment_path(self._write_segment + 1))):
+            return self._write_fd
+
+        segments = self._segments()
+        number = segments[-1] if segments else 1
+        path = self._segment_path(number)
+        if os.path.exists(path) and os.path.getsize(path) >= self.segment_size:
+            number += 1
+            path = self._segment_path(number)
+            logger.info(f"🔄 Starting download log segment {path}")
+
+        if self._write_fd is not None:
+            os.fsync(self._write_fd)
+            os.close(self._write_fd)
+        self._write_fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._write_segment = number
+        return self._write_fd
+
+    def append(self, event):
+        line = (json.dumps(event) + '\n').encode('utf-8')
+        with self._lock:
+            os.write(self._open_segment(), line)
+            self._unsynced = True
+        self.refresh()
+
+    def _tail(self, number, offset):
+        """Apply the complete lines of segment number after offset; returns the new offset"""
+        path = self._segment_path(number)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return offset
+        if size <= offset:
+            return offset
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        # Only consume complete lines; a partial one is picked up next time
+        end = data.rfind(b'\n') + 1
+        for line in data[:end].splitlines():
+            try:
+                self.stats.add(json.loads(line))
+            except (ValueError, KeyError):
+                logger.error(f"❌ Skipping corrupt download log line in {path}")
+        return offset + end
+
+    def refresh(self):
+        """Apply events appended since the last call (by any process) to stats"""
+        with self._read_lock:
+            # A writer that picked its segment just before the next one was
+            # started can still land a line in the previous segment
+            if self._previous_segment is not None:
+                self._previous_offset = self._tail(self._previous_segment, self._previous_offset)
+            while True:
+                self._read_offset = self._tail(self._read_segment, self._read_offset)
+
+                # Move on once this segment is read and the next one exists,
+                # whatever size the segments were rotated at
+                if os.path.exists(self._segment_path(self._read_segment + 1)):
+                    self._previous_segment = self._read_segment
+                    self._previous_offset = self._read_offset
+                    self._read_segment += 1
+                    self._read_offset = 0
+                    continue
+                return
+
+    def iter_events(self):
+        """Stream every logged event from disk, oldest first"""
+        for number in self._segments():
+            with open(self._segment_path(number), 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    def flush(self):
+        with self._lock:
+            if self._unsynced and self._write_fd is not None:
+                os.fsync(self._write_fd)
+                self._unsynced = False
+
+    def _run_flusher(self):
+        while not self._closed.wait(self.fsync_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Error syncing download log: {e}")
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+        with self._lock:
+            if self._write_fd is not None:
+                os.close(self._write_fd)
+                self._write_fd = None
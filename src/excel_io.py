@@ -0,0 +1,60 @@
+import openpyxl
+
+class Sheet:
+    """headers and rows of a worksheet opened by read_sheet
+
+    Use it as a context manager (or call close()) so the workbook is closed
+    whether or not rows is read to the end.
+    """
+
+    def __init__(self, workbook, headers, rows):
+        self._workbook = workbook
+        self.headers = headers
+        self.rows = rows
+
+    def close(self):
+        self._workbook.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def read_sheet(source):
+    """Open the first sheet of a workbook for streaming reads
+
+    Returns a Sheet: rows is a generator of dicts keyed by header, skipping
+    rows whose first cell is empty. The workbook is opened in read-only
+    mode, so memory stays flat however many rows there are.
+    """
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        # Some writers store a wrong <dimension>; read to the real end of the sheet
+        ws.reset_dimensions()
+        values = ws.iter_rows(values_only=True)
+        headers = list(next(values, None) or [])
+    except Exception:
+        wb.close()
+        raise
+
+    def rows():
+        for row in values:
+            if row and row[0]:  # Skip empty rows
+                yield dict(zip(headers, row))
+
+    return Sheet(wb, headers, rows())
+
+def write_sheet(target, title, headers, rows):
+    """Write headers and rows (iterables of values) to a single-sheet workbook
+
+    Uses write-only mode, so rows may be a generator and are streamed to
+    target (a path or binary file object) without building cells in memory.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+    wb.save(target)
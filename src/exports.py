@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+import tempfile
+from excel_io import write_sheet
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Rows per chunk for the text formats: small enough that the first bytes go
+# out immediately, large enough to avoid one tiny write per row
+ROWS_PER_CHUNK = 500
+
+EXPORT_FORMATS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson'
+}
+
+def _stream_csv(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the UTF-8 file with the right encoding
+    buffer.write('\ufeff')
+    writer.writerow(headers)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def _stream_ndjson(headers, rows):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(headers, row)), ensure_ascii=False))
+        if len(lines) == ROWS_PER_CHUNK:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+def _stream_xlsx(title, headers, rows):
+    # A workbook is a ZIP whose directory comes last, so it is built into an
+    # anonymous temp file (gone once closed) and then sent in chunks
+    with tempfile.TemporaryFile() as f:
+        write_sheet(f, title, headers, rows)
+        f.seek(0)
+        while True:
+            chunk = f.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+def stream_export(export_format, title, headers, rows):
+    """Yield an export of headers and rows (iterables of values) as bytes
+
+    export_format is one of EXPORT_FORMATS. CSV and NDJSON are produced
+    incrementally as rows are consumed; XLSX is written with a write-only
+    workbook, so memory stays flat for every format.
+    """
+    if export_format == 'csv':
+        return _stream_csv(headers, rows)
+    if export_format == 'ndjson':
+        return _stream_ndjson(headers, rows)
+    if export_format == 'xlsx':
+        return _stream_xlsx(title, headers, rows)
+    raise ValueError(f"Unsupported export format: {export_format}")
@@ -0,0 +1,108 @@
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from flask import Response, send_file
+from werkzeug.security import safe_join
+
+# Files up to this size are kept in memory; larger ones are sent from disk
+MAX_MEMORY_SIZE = 512 * 1024
+
+# Hashed URLs never change content, so they can be cached for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, no-cache'
+
+HASHED_NAME = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{12})(?P<ext>\.[^.]+)$')
+
+class _Asset:
+    def __init__(self, path, stat):
+        self.path = path
+        self.stat_key = (stat.st_mtime_ns, stat.st_size)
+        self.mtime = stat.st_mtime
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        sha = hashlib.sha256()
+        chunks = []
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                sha.update(chunk)
+                if stat.st_size <= MAX_MEMORY_SIZE:
+                    chunks.append(chunk)
+        self.hash = sha.hexdigest()[:12]
+        self.data = b''.join(chunks) if stat.st_size <= MAX_MEMORY_SIZE else None
+
+class AssetStore:
+    """Static files from asset_dir, fingerprinted and served with validators
+
+    Every file gets a content hash. url() turns a name into a hashed URL
+    (logo.png -> /static/logo.<hash>.png), which is served with
+    Cache-Control: immutable; plain names still work but are revalidated
+    with the ETag. Small files are kept in memory. Conditional
+    (If-None-Match/If-Modified-Since) and Range requests are supported.
+    Files are re-read when their mtime or size changes.
+    """
+
+    def __init__(self, asset_dir, url_prefix='/static/'):
+        self.asset_dir = asset_dir
+        self.url_prefix = url_prefix
+        self._lock = threading.Lock()
+        self._assets = {}
+
+    def _get(self, name):
+        path = safe_join(self.asset_dir, name)
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        with self._lock:
+            asset = self._assets.get(name)
+            if asset is None or asset.stat_key != (stat.st_mtime_ns, stat.st_size):
+                asset = self._assets[name] = _Asset(path, stat)
+            return asset
+
+    def url(self, name):
+        """Content-hashed URL for name, or the plain URL if the file is missing"""
+        asset = self._get(name)
+        if asset is None:
+            return self.url_prefix + name
+        stem, ext = os.path.splitext(name)
+        return f'{self.url_prefix}{stem}.{asset.hash}{ext}'
+
+    def versioned(self, html, names=None):
+        """html with every plain URL of the given (default: all) assets replaced by its hashed URL"""
+        if names is None:
+            names = sorted(os.listdir(self.asset_dir)) if os.path.isdir(self.asset_dir) else []
+        for name in names:
+            html = html.replace(self.url_prefix + name, self.url(name))
+        return html
+
+    def response(self, request, filename):
+        """Response for /static/<filename>, or None if there is no such asset"""
+        immutable = False
+        asset = self._get(filename)
+        if asset is None:
+            match = HASHED_NAME.match(filename)
+            if match is None:
+                return None
+            asset = self._get(match.group('stem') + match.group('ext'))
+            if asset is None:
+                return None
+            # An outdated hash still gets the current file, just not cached for good
+            immutable = match.group('hash') == asset.hash
+
+        cache_control = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        if asset.data is None:
+            response = send_file(asset.path, mimetype=asset.mimetype, etag=asset.hash,
+                                 last_modified=asset.mtime, conditional=True)
+        else:
+            response = Response(asset.data, mimetype=asset.mimetype)
+            response.set_etag(asset.hash)
+            response.last_modified = asset.mtime
+            response = response.make_conditional(request, accept_ranges=True, complete_length=len(asset.data))
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.headers['Cache-Control'] = cache_control
+        return response
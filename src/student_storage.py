@@ -0,0 +1,315 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from excel_io import read_sheet, write_sheet
+
+logger = logging.getLogger(__name__)
+
+STUDENT_FIELDS = ['student_name', 'batch_number', 'batch_start_date', 'batch_end_date', 'sixerclass_id']
+
+class DuplicateStudentError(ValueError):
+    """A written sixerclass_id already belongs to a student in the backend"""
+
+class SQLiteStudentBackend:
+    """Student persistence in an SQLite database (WAL mode)
+
+    Every mutation is a single-row INSERT/UPDATE/DELETE, so the cost of an
+    edit does not depend on how many students exist. Rows are returned in
+    insertion order (rowid), which survives a change of sixerclass_id.
+
+    Each mutation also appends the touched IDs to student_changes in the same
+    transaction (with the previous ID when a sixerclass_id is changed). Its
+    highest version number is the dataset version that other processes
+    (gunicorn workers) poll to pick up changes incrementally.
+    """
+
+    name = 'sqlite'
+
+    # Change rows kept for incremental sync; workers further behind reload fully
+    CHANGE_LOG_LIMIT = 10000
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode; transactions are opened explicitly below
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA busy_timeout=5000')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS students (
+                sixerclass_id TEXT PRIMARY KEY,
+                student_name TEXT NOT NULL,
+                batch_number TEXT NOT NULL,
+                batch_start_date TEXT,
+                batch_end_date TEXT
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS student_changes (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                sixerclass_id TEXT NOT NULL,
+                renamed_from TEXT
+            )
+        ''')
+
+    def _current_version(self):
+        return self._conn.execute('SELECT COALESCE(MAX(version), 0) FROM student_changes').fetchone()[0]
+
+    def _select_students(self, where='', params=()):
+        rows = self._conn.execute(
+            'SELECT student_name, batch_number, batch_start_date, batch_end_date, sixerclass_id '
+            'FROM students ' + where + ' ORDER BY rowid', params
+        ).fetchall()
+        return [dict(zip(STUDENT_FIELDS, row)) for row in rows]
+
+    def version(self):
+        with self._lock:
+            return self._current_version()
+
+    def snapshot(self):
+        """(version, students) read in one transaction"""
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                return self._current_version(), self._select_students()
+            finally:
+                self._conn.execute('COMMIT')
+
+    def changes_since(self, version):
+        """(new_version, {sixerclass_id: student or None}, {new_id: previous_id}) for rows changed after version
+
+        The last mapping lists the sixerclass_id changes among them. None
+        means the change log no longer reaches back that far and the caller
+        should take a full snapshot instead.
+        """
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                oldest = self._conn.execute('SELECT MIN(version) FROM student_changes').fetchone()[0]
+                if oldest is not None and oldest > version + 1:
+                    return None
+                changed = {}
+                renamed = {}
+                for sid, renamed_from in self._conn.execute(
+                        'SELECT sixerclass_id, renamed_from FROM student_changes WHERE version > ? ORDER BY version',
+                        (version,)):
+                    changed[sid] = None
+                    if renamed_from is not None:
+                        renamed[sid] = renamed_from
+                ids = list(changed)
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    for student in self._select_students(f'WHERE sixerclass_id IN ({placeholders})', chunk):
+                        changed[student['sixerclass_id']] = student
+                return self._current_version(), changed, renamed
+            finally:
+                self._conn.execute('COMMIT')
+
+    def _write(self, changes, apply):
+        """Run apply() and log changes ((sixerclass_id, renamed_from) pairs) in one write transaction
+
+        Returns (version_before, version_after). Raises DuplicateStudentError
+        if apply() hits an existing sixerclass_id.
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                before = self._current_version()
+                apply()
+                self._conn.executemany('INSERT INTO student_changes (sixerclass_id, renamed_from) VALUES (?, ?)',
+                                       changes)
+                after = self._current_version()
+                if after // 1000 != before // 1000:
+                    self._conn.execute('DELETE FROM student_changes WHERE version <= ?',
+                                       (after - self.CHANGE_LOG_LIMIT,))
+                self._conn.execute('COMMIT')
+            except sqlite3.IntegrityError as e:
+                self._conn.execute('ROLLBACK')
+                if 'UNIQUE' in str(e):
+                    raise DuplicateStudentError(str(e))
+                raise
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return before, after
+
+    def insert_many(self, students):
+        return self._write([(s['sixerclass_id'], None) for s in students], lambda: self._conn.executemany(
+            'INSERT INTO students (student_name, batch_number, batch_start_date, batch_end_date, sixerclass_id) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [[s[field] for field in STUDENT_FIELDS] for s in students]
+        ))
+
+    def update(self, original_id, student):
+        changes = [(original_id, None)]
+        if student['sixerclass_id'] != original_id:
+            changes.append((student['sixerclass_id'], original_id))
+        return self._write(changes, lambda: self._conn.execute(
+            'UPDATE students SET student_name = ?, batch_number = ?, batch_start_date = ?, '
+            'batch_end_date = ?, sixerclass_id = ? WHERE sixerclass_id = ?',
+            [student[field] for field in STUDENT_FIELDS] + [original_id]
+        ))
+
+    def delete(self, sixerclass_id):
+        return self._write([(sixerclass_id, None)], lambda: self._conn.execute(
+            'DELETE FROM students WHERE sixerclass_id = ?', (sixerclass_id,)))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class ExcelStudentBackend:
+    """student-data.xlsx as the system of record, saved write-behind
+
+    Mutations only update an in-memory copy and mark it dirty. A background
+    thread waits write_delay seconds so bursts of edits coalesce, then writes
+    the whole workbook once to a temp file and renames it into place.
+    close() (registered at exit) flushes anything still pending.
+
+    The version is a per-process mutation counter, started from the
+    workbook's mtime (in ns) so it keeps increasing across restarts.
+    """
+
+    name = 'excel'
+
+    # The workbook is owned by one process: there is no cross-process change
+    # tracking, so run a single worker with this backend
+
+    def __init__(self, excel_path, write_delay=1.0):
+        self.excel_path = excel_path
+        self.write_delay = write_delay
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._rows = {}
+        self._dirty = False
+        self._closed = False
+        self._writer = None
+        self._version = 0
+
+    def version(self):
+        return self._version
+
+    def snapshot(self):
+        if not os.path.exists(self.excel_path):
+            return self._version, []
+        students = read_students_excel(self.excel_path)
+        with self._lock:
+            self._rows = {s['sixerclass_id']: s for s in students}
+            self._version = max(self._version, os.stat(self.excel_path).st_mtime_ns)
+            return self._version, students
+
+    def changes_since(self, version):
+        # Only this process writes, and it already applied its own changes
+        return self._version, {}, {}
+
+    def _bump(self):
+        # Caller holds self._lock; returns (version_before, version_after)
+        self._version += 1
+        return self._version - 1, self._version
+
+    def _mark_dirty(self):
+        # Caller holds self._lock
+        self._dirty = True
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run_writer, name='excel-writer', daemon=True)
+            self._writer.start()
+        self._changed.notify()
+
+    def _run_writer(self):
+        while True:
+            with self._lock:
+                while not self._dirty and not self._closed:
+                    self._changed.wait()
+                if self._closed:
+                    return
+                # Let the rest of a burst of edits arrive before writing
+                deadline = time.monotonic() + self.write_delay
+                while not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._changed.wait(remaining)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        """Write pending changes now (temp file + atomic rename)"""
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                students = list(self._rows.values())
+                self._dirty = False
+            try:
+                tmp_path = f"{self.excel_path}.{os.getpid()}.tmp.xlsx"
+                with open(tmp_path, 'wb') as f:
+                    write_students_excel(f, students)
+                    # On disk before the rename, so a crash leaves the old or the new workbook
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.excel_path)
+                logger.info(f"💾 Saved {len(students)} students to {self.excel_path}")
+            except Exception as e:
+                logger.error(f"❌ Error saving student workbook: {e}")
+                with self._lock:
+                    self._dirty = True
+
+    def insert_many(self, students):
+        with self._lock:
+            for student in students:
+                self._rows[student['sixerclass_id']] = student
+            self._mark_dirty()
+            return self._bump()
+
+    def update(self, original_id, student):
+        with self._lock:
+            self._rows = {
+                (student['sixerclass_id'] if sid == original_id else sid): (student if sid == original_id else s)
+                for sid, s in self._rows.items()
+            }
+            self._mark_dirty()
+            return self._bump()
+
+    def delete(self, sixerclass_id):
+        with self._lock:
+            self._rows.pop(sixerclass_id, None)
+            self._mark_dirty()
+            return self._bump()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._changed.notify()
+            writer = self._writer
+        if writer is not None:
+            writer.join()
+        self.flush()
+
+def clean_student_row(row):
+    """Normalise a spreadsheet row into a student record of stripped strings"""
+    return {field: str(row[field]).strip() for field in STUDENT_FIELDS}
+
+def read_students_excel(path):
+    """Read student rows (as dicts keyed by header) from the first sheet of a workbook"""
+    with read_sheet(path) as sheet:
+        return list(sheet.rows)
+
+def write_students_excel(target, students):
+    """Write students to a workbook (path or binary file object) with the standard import/export columns"""
+    write_sheet(target, 'Students', STUDENT_FIELDS,
+                ([student[field] for field in STUDENT_FIELDS] for student in students))
+
+def create_backend(kind, db_path, excel_path, excel_write_delay=1.0):
+    """Build the storage backend selected by STUDENT_STORAGE"""
+    if kind == 'excel':
+        return ExcelStudentBackend(excel_path, write_delay=excel_write_delay)
+    if kind != 'sqlite':
+        logger.warning(f"❌ Unknown STUDENT_STORAGE '{kind}', using sqlite")
+    return SQLiteStudentBackend(db_path)
@@ -0,0 +1,444 @@
+import bisect
+from array import array
+import itertools
+import threading
+from student_storage import DuplicateStudentError
+
+def normalize_name(name):
+    """Case- and whitespace-insensitive form of a student name used for lookups"""
+    return ' '.join(str(name or '').split()).casefold()
+
+class _TrigramIndex:
+    """Substring index over student name, batch number and ID
+
+    Each student gets a row number and every trigram of its lower-cased
+    search text maps to a compact array of row numbers. A query is checked
+    only against the rows of its rarest trigram, so its cost follows the
+    number of candidates, not the number of students. Removed students
+    leave a dead row behind until the index is rebuilt.
+    """
+
+    SEPARATOR = '\x00'  # between fields, so no query matches across them
+
+    def __init__(self, students=()):
+        self._postings = {}  # trigram -> array of rows
+        self._rows = []      # row -> sixerclass_id, None once removed
+        self._row_of = {}    # sixerclass_id -> row
+        self.dead_rows = 0
+        for student in students:
+            self.add(student)
+
+    def __len__(self):
+        return len(self._row_of)
+
+    @classmethod
+    def text(cls, student):
+        return cls.SEPARATOR.join((student['student_name'], student['batch_number'], student['sixerclass_id'])).lower()
+
+    def add(self, student):
+        sid = student['sixerclass_id']
+        row = self._row_of[sid] = len(self._rows)
+        self._rows.append(sid)
+        text = self.text(student)
+        for gram in {text[i:i + 3] for i in range(len(text) - 2)}:
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array('i')
+            postings.append(row)
+
+    def remove(self, sixerclass_id):
+        row = self._row_of.pop(sixerclass_id, None)
+        if row is not None:
+            self._rows[row] = None
+            self.dead_rows += 1
+
+    def search(self, query, students_by_id):
+        """sixerclass_ids whose name, batch or ID contains query (lower case)"""
+        if self.SEPARATOR in query:
+            return set()
+        if len(query) < 3:
+            # Shorter than a trigram: every occurrence lies inside some trigram
+            # containing it, so the union of their rows is exact
+            rows = set()
+            for gram, postings in self._postings.items():
+                if query in gram:
+                    rows.update(postings)
+            return {self._rows[row] for row in rows} - {None}
+
+        rarest = None
+        for i in range(len(query) - 2):
+            postings = self._postings.get(query[i:i + 3])
+            if postings is None:
+                return set()
+            if rarest is None or len(postings) < len(rarest):
+                rarest = postings
+
+        matches = set()
+        for row in rarest:
+            sid = self._rows[row]
+            if sid is not None and query in self.text(students_by_id[sid]):
+                matches.add(sid)
+        return matches
+
+SORT_FIELDS = ('student_name', 'batch_number', 'batch_start_date', 'batch_end_date', 'sixerclass_id')
+
+class StudentStore:
+    """In-memory student records with hash indexes
+
+    Records are kept in a dict keyed by sixerclass_id (insertion ordered, so
+    listings keep the spreadsheet order), and each one has a sequence number
+    recording that position. A composite index on
+    (normalized name, batch_number, sixerclass_id) answers authentication and
+    a batch index answers per-batch queries, all in O(1). Sorted indexes
+    (one per SORT_FIELDS entry, built on first use and then kept up to date)
+    let page() serve any page of a sorted listing without sorting, and a
+    trigram index (also built on first use) answers substring searches.
+
+    With a backend (see student_storage), every mutation is written through
+    to it before the in-memory indexes change, and sync() pulls in changes
+    other processes made since the last known backend version.
+    """
+
+    def __init__(self, students=None, backend=None):
+        self.backend = backend
+        self.version = None
+        self._lock = threading.RLock()
+        self._by_id = {}
+        self._sequence = {}  # sixerclass_id -> insertion sequence number
+        self._next_sequence = 0
+        self._by_identity = {}
+        self._by_batch = {}
+        self._sorted = {}  # field -> sorted list of sort_key() tuples
+        self._search_index = None  # _TrigramIndex
+        self._changes = 0
+        if students:
+            self.load(students)
+
+    @staticmethod
+    def _identity_key(student_name, batch_number, sixerclass_id):
+        return (normalize_name(student_name), str(batch_number or '').strip(), str(sixerclass_id or '').strip())
+
+    @staticmethod
+    def sort_key(student, field):
+        """Position of a student in the index for field; unique thanks to the sixerclass_id tiebreak"""
+        value = student[field]
+        value = normalize_name(value) if field == 'student_name' else str(value or '')
+        return (value, student['sixerclass_id'])
+
+    def _index(self, student):
+        key = self._identity_key(student['student_name'], student['batch_number'], student['sixerclass_id'])
+        self._by_identity[key] = student
+        self._by_batch.setdefault(student['batch_number'], {})[student['sixerclass_id']] = student
+        for field, keys in self._sorted.items():
+            bisect.insort(keys, self.sort_key(student, field))
+        if self._search_index is not None:
+            self._search_index.add(student)
+        self._changes += 1
+
+    def _unindex(self, student):
+        key = self._identity_key(student['student_name'], student['batch_number'], student['sixerclass_id'])
+        self._by_identity.pop(key, None)
+        batch = self._by_batch.get(student['batch_number'])
+        if batch is not None:
+            batch.pop(student['sixerclass_id'], None)
+            if not batch:
+                del self._by_batch[student['batch_number']]
+        for field, keys in self._sorted.items():
+            sort_key = self.sort_key(student, field)
+            i = bisect.bisect_left(keys, sort_key)
+            if i < len(keys) and keys[i] == sort_key:
+                del keys[i]
+        if self._search_index is not None:
+            self._search_index.remove(student['sixerclass_id'])
+            if self._search_index.dead_rows > max(1000, len(self._search_index)):
+                self._search_index = None  # mostly dead rows; rebuild on next search
+        self._changes += 1
+
+    def _put(self, student):
+        """Store a record; a new sixerclass_id goes to the end of the insertion order"""
+        sid = student['sixerclass_id']
+        if sid not in self._sequence:
+            self._sequence[sid] = self._next_sequence
+            self._next_sequence += 1
+        self._by_id[sid] = student
+
+    def _pop(self, sixerclass_id):
+        self._sequence.pop(sixerclass_id, None)
+        return self._by_id.pop(sixerclass_id, None)
+
+    def _drop_lazy_indexes_if_bulk(self, count):
+        """Forget the sorted and search indexes before a large batch of changes
+
+        Rebuilding them on next use is cheaper than thousands of updates.
+        """
+        if count > max(1000, len(self._by_id) // 10):
+            self._sorted = {}
+            self._search_index = None
+
+    def _sorted_keys(self, field):
+        keys = self._sorted.get(field)
+        if keys is None:
+            keys = self._sorted[field] = sorted(self.sort_key(s, field) for s in self._by_id.values())
+        return keys
+
+    def build_search_index(self):
+        """Build the substring search index ahead of the first search
+
+        The index is built from a snapshot without holding the lock (it can
+        take seconds for very large stores) and only installed if no
+        student changed meanwhile. Safe to run in a background thread.
+        """
+        with self._lock:
+            changes = self._changes
+            students = list(self._by_id.values())
+        index = _TrigramIndex(students)
+        with self._lock:
+            if self._changes != changes:
+                return False
+            self._search_index = index
+            return True
+
+    def _search(self, query):
+        if self._search_index is None:
+            self._search_index = _TrigramIndex(self._by_id.values())
+        return self._search_index.search(query, self._by_id)
+
+    def load(self, students):
+        """Replace all records; later duplicates of a sixerclass_id win"""
+        with self._lock:
+            self._by_id = {}
+            self._sequence = {}
+            self._next_sequence = 0
+            self._by_identity = {}
+            self._by_batch = {}
+            self._sorted = {}
+            self._search_index = None
+            for student in students:
+                existing = self._by_id.get(student['sixerclass_id'])
+                if existing is not None:
+                    self._unindex(existing)
+                self._put(student)
+                self._index(student)
+
+    def sync(self):
+        """Bring the store up to date with the backend; returns True if anything changed"""
+        if self.backend is None:
+            return False
+        if self.version is not None and self.backend.version() == self.version:
+            return False
+
+        with self._lock:
+            changes = None
+            if self.version is not None:
+                changes = self.backend.changes_since(self.version)
+            if changes is None:
+                self.version, students = self.backend.snapshot()
+                self.load(students)
+                return True
+
+            self.version, changed, renamed = changes
+            self._drop_lazy_indexes_if_bulk(len(changed))
+            self._apply_renames(changed, renamed)
+            for sixerclass_id, student in changed.items():
+                existing = self._by_id.get(sixerclass_id)
+                if existing is not None:
+                    self._unindex(existing)
+                if student is None:
+                    self._pop(sixerclass_id)
+                else:
+                    self._put(student)
+                    self._index(student)
+            return bool(changed)
+
+    def _apply_renames(self, changed, renamed):
+        """Give students whose sixerclass_id another process changed their new ID in place
+
+        They keep their position and sequence number, as in the process that
+        made the change. Handled entries are removed from changed.
+        """
+        moved = {}  # current ID -> new ID
+        for new_id, student in changed.items():
+            if student is None or new_id not in renamed:
+                continue
+            # Follow A -> B -> C back to the ID this store still knows
+            old_id, seen = renamed[new_id], {new_id}
+            while old_id not in self._by_id and old_id in renamed and old_id not in seen:
+                seen.add(old_id)
+                old_id = renamed[old_id]
+            if old_id in self._by_id and old_id in changed and old_id != new_id and old_id not in moved:
+                moved[old_id] = new_id
+        if not moved:
+            return
+
+        for new_id in moved.values():
+            if new_id in self._by_id and new_id not in moved:
+                self._unindex(self._pop(new_id))
+        sequences = {}
+        for old_id in moved:
+            self._unindex(self._by_id[old_id])
+            sequences[old_id] = self._sequence.pop(old_id)
+        self._by_id = {moved.get(sid, sid): (changed[moved[sid]] if sid in moved else s)
+                       for sid, s in self._by_id.items()}
+        for old_id, new_id in moved.items():
+            self._sequence[new_id] = sequences[old_id]
+            self._index(changed.pop(new_id))
+
+    def _written(self, versions):
+        """Advance the known version after our own write, unless others wrote in between"""
+        before, after = versions
+        if before == self.version:
+            self.version = after
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, sixerclass_id):
+        return sixerclass_id in self._by_id
+
+    def all(self):
+        """Snapshot list of all students in insertion order"""
+        with self._lock:
+            return list(self._by_id.values())
+
+    def get(self, sixerclass_id):
+        return self._by_id.get(sixerclass_id)
+
+    def find(self, student_name, batch_number, sixerclass_id):
+        """Student matching all three login fields, or None"""
+        return self._by_identity.get(self._identity_key(student_name, batch_number, sixerclass_id))
+
+    def by_batch(self, batch_number):
+        with self._lock:
+            return list(self._by_batch.get(batch_number, {}).values())
+
+    def page(self, sort=None, descending=False, after=None, offset=0, limit=None, search=None):
+        """(total, students) for one page of a listing
+
+        Without sort, students are listed in insertion order. With sort (one
+        of SORT_FIELDS) they are read from that field's sorted index, and
+        after (the sort_key() of the last student on the previous page)
+        starts the page right behind it with a binary search, so any page
+        costs O(log n + page size). offset skips further students.
+
+        search limits the listing to students whose name, batch or ID
+        contains it (case-insensitive); total counts the matches. A small
+        match set is sorted on its own instead of filtering the index.
+        """
+        with self._lock:
+            matches = self._search(search.lower()) if search else None
+            total = len(self._by_id) if matches is None else len(matches)
+
+            if sort is None:
+                if matches is None:
+                    students = iter(self._by_id.values())
+                else:
+                    # Insertion order of the matches alone, not a pass over every student
+                    students = (self._by_id[sid] for sid in sorted(matches, key=self._sequence.__getitem__))
+            else:
+                if matches is not None and len(matches) * 8 < len(self._by_id):
+                    keys = sorted(self.sort_key(self._by_id[sid], sort) for sid in matches)
+                    matches = None  # keys hold only matches
+                else:
+                    keys = self._sorted_keys(sort)
+                if descending:
+                    end = len(keys) if after is None else bisect.bisect_left(keys, after)
+                    positions = range(end - 1, -1, -1)
+                else:
+                    start = 0 if after is None else bisect.bisect_right(keys, after)
+                    positions = range(start, len(keys))
+                ids = (keys[i][1] for i in positions)
+                if matches is not None:
+                    ids = (sid for sid in ids if sid in matches)
+                students = (self._by_id[sid] for sid in ids)
+
+            end = None if limit is None else offset + limit
+            return total, list(itertools.islice(students, offset, end))
+
+    def batch_numbers(self):
+        with self._lock:
+            return list(self._by_batch.keys())
+
+    def add(self, student):
+        """Add a student; returns False if the sixerclass_id already exists"""
+        added, _ = self.add_many([student])
+        return bool(added)
+
+    def add_many(self, students):
+        """Add several students in one backend write
+
+        Returns (added, duplicates): students whose sixerclass_id is already
+        taken (in the store, the backend or earlier in the list) are skipped.
+        """
+        with self._lock:
+            while True:
+                added = []
+                duplicates = []
+                seen = set()
+                for student in students:
+                    sid = student['sixerclass_id']
+                    if sid in self._by_id or sid in seen:
+                        duplicates.append(student)
+                        continue
+                    seen.add(sid)
+                    added.append(student)
+
+                if not (added and self.backend):
+                    break
+                try:
+                    self._written(self.backend.insert_many(added))
+                    break
+                except DuplicateStudentError:
+                    # Another process added some of these IDs since our last
+                    # sync; pick them up and sort the list again
+                    if not self.sync():
+                        raise
+            self._drop_lazy_indexes_if_bulk(len(added))
+            for student in added:
+                self._put(student)
+                self._index(student)
+            return added, duplicates
+
+    def update(self, original_id, student):
+        """Replace the record stored under original_id, keeping its position
+
+        Returns False if original_id is unknown or the new sixerclass_id
+        belongs to another student.
+        """
+        with self._lock:
+            existing = self._by_id.get(original_id)
+            if existing is None:
+                return False
+            new_id = student['sixerclass_id']
+            if new_id != original_id and new_id in self._by_id:
+                return False
+
+            if self.backend:
+                try:
+                    self._written(self.backend.update(original_id, student))
+                except DuplicateStudentError:
+                    # new_id was taken by another process since our last sync
+                    self.sync()
+                    return False
+            self._unindex(existing)
+            if new_id == original_id:
+                self._by_id[new_id] = student
+            else:
+                self._sequence[new_id] = self._sequence.pop(original_id)
+                # Rebuild to keep the record in its original position (rare)
+                self._by_id = {
+                    (new_id if sid == original_id else sid): (student if sid == original_id else s)
+                    for sid, s in self._by_id.items()
+                }
+            self._index(student)
+            return True
+
+    def delete(self, sixerclass_id):
+        """Remove a student; returns the removed record or None"""
+        with self._lock:
+            if sixerclass_id not in self._by_id:
+                return None
+            if self.backend:
+                self._written(self.backend.delete(sixerclass_id))
+            student = self._pop(sixerclass_id)
+            self._unindex(student)
+            return student
@@ -0,0 +1,99 @@
+"""Optimized (JPEG) derivatives of certificate templates.
+
+The certificate page is one point per template pixel, so the template's
+own resolution is 72 dpi relative to the page. A derivative flattens the
+alpha channel onto white (what a viewer shows on paper anyway), optionally
+downsamples to a lower dpi, and JPEG-encodes at the given quality.
+Reportlab embeds JPEGs as-is, so every certificate carries the small
+derivative instead of the losslessly re-compressed PNG.
+
+Usage:
+    python src/template_optimizer.py [--quality 85] [--dpi 72] [template.png]
+"""
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import re
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUALITY = 85
+
+# Page units are points and the page is as many points wide as the template
+# is pixels, so the source resolution corresponds to 72 dpi
+PAGE_DPI = 72
+
+def file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def derivative_name(source_path, source_hash, quality, dpi):
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    settings = f"q{quality}" + (f"-{dpi}dpi" if dpi else '')
+    return f"{stem}-{source_hash[:16]}-{settings}.jpg"
+
+def optimize_template(source_path, cache_dir=None, quality=DEFAULT_QUALITY, dpi=None):
+    """Path of the optimized derivative of source_path, building it if needed
+
+    Derivatives are cached in cache_dir (default: optimized/ next to the
+    source) under a name made of the source hash and the settings, so a
+    new template or setting builds a new file and anything else reuses the
+    existing one. dpi below PAGE_DPI downsamples; higher values keep the
+    source resolution.
+    """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(source_path), 'optimized')
+    name = derivative_name(source_path, file_hash(source_path), quality, dpi)
+    path = os.path.join(cache_dir, name)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with Image.open(source_path) as source:
+        image = source.convert('RGBA')
+    flat = Image.new('RGB', image.size, (255, 255, 255))
+    flat.paste(image, mask=image.getchannel('A'))
+
+    if dpi and dpi < PAGE_DPI:
+        scale = dpi / PAGE_DPI
+        flat = flat.resize((max(1, round(flat.width * scale)), max(1, round(flat.height * scale))), Image.LANCZOS)
+
+    # Write to a temp name first: other workers may be building the same file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    flat.save(tmp_path, 'JPEG', quality=quality, optimize=True)
+    os.replace(tmp_path, path)
+    logger.info(f"✅ Optimized template: {name} ({os.path.getsize(source_path):,} -> {os.path.getsize(path):,} bytes)")
+
+    # Derivatives of older versions of this template are no longer used. Only
+    # names made of this stem and a hash match, not other templates whose
+    # names start with the same stem (certificate-template-v2-...)
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    derivative = re.compile(rf'^{re.escape(stem)}-(?P<hash>[0-9a-f]{{16}})-q\d+(-\d+dpi)?\.jpg$')
+    for old_path in glob.glob(os.path.join(cache_dir, f"{glob.escape(stem)}-*.jpg")):
+        match = derivative.match(os.path.basename(old_path))
+        if match and match.group('hash') != name[len(stem) + 1:len(stem) + 17]:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+    return path
+
+def main():
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Build the optimized certificate template derivative")
+    parser.add_argument('template', nargs='?',
+                        default=os.path.join(base_dir, 'data', 'templates', 'certificate-template.png'))
+    parser.add_argument('--quality', type=int, default=int(os.environ.get('TEMPLATE_JPEG_QUALITY', DEFAULT_QUALITY)))
+    parser.add_argument('--dpi', type=int, default=int(os.environ.get('TEMPLATE_DPI', '0')) or None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(optimize_template(args.template, quality=args.quality, dpi=args.dpi))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""Certificate templates, their layouts and which batch uses which.
+
+Everything lives in TEMPLATE_DIR:
+
+    certificate-template.png   a template (.pdf, .png or .jpg; a PDF wins over a raster of the same name)
+    certificate-template.json  its layout (optional, see certificate_layout)
+    batches.json               {"default": "certificate-template", "batches": {"AWS-2024-002": "advanced"}}
+
+Templates are named after their file without the extension. Batches not in
+batches.json (or mapped to a missing template) use the default template.
+Each template is compiled into its own CertificateGenerator. refresh()
+compares the directory's mtimes with the last scan and rebuilds only what
+changed; start_watching() runs it in the background, so requests never
+touch the file system to find their template.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from certificate_generator import CertificateGenerator, template_supported
+from certificate_layout import Layout
+from template_optimizer import DEFAULT_QUALITY
+
+logger = logging.getLogger(__name__)
+
+# In order of preference when several files share a name
+TEMPLATE_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg')
+LAYOUT_EXTENSION = '.json'
+BATCHES_FILENAME = 'batches.json'
+DEFAULT_TEMPLATE = 'certificate-template'
+
+# Seconds between scans of the template directory
+RELOAD_INTERVAL = 2.0
+
+class _Template:
+    def __init__(self, name, files, generator):
+        self.name = name
+        self.files = files  # (template file, its stat, layout stat) it was built from
+        self.generator = generator
+
+class TemplateRegistry:
+    """All templates in template_dir, compiled and mapped to batches
+
+    Exposes the CertificateGenerator calls the app makes, routed to the
+    template of each student's batch. preload decodes (and optimizes) each
+    template as soon as it is loaded rather than on its first certificate.
+    A registry built from another one's snapshot() uses exactly the same
+    template files, layouts and batch mapping instead of scanning the
+    directory (see bulk_certificates).
+    """
+
+    def __init__(self, template_dir, optimize=False, quality=DEFAULT_QUALITY, dpi=None, preload=False,
+                 snapshot=None):
+        self.template_dir = template_dir
+        self.template_options = {'optimize': optimize, 'quality': quality, 'dpi': dpi}
+        self.preload = preload
+        self._refresh_lock = threading.Lock()
+        self._stats = None
+        # (templates by name, template name by batch, default name), replaced as a whole
+        self._state = ({}, {}, None)
+        self._watcher = None
+        if snapshot is None:
+            self.refresh()
+        else:
+            self._load_snapshot(snapshot)
+
+    def _scan(self):
+        stats = {}
+        try:
+            with os.scandir(self.template_dir) as entries:
+                for entry in entries:
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    if entry.is_file() and (ext in TEMPLATE_EXTENSIONS or ext == LAYOUT_EXTENSION):
+                        st = entry.stat()
+                        stats[entry.name] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            pass
+        return stats
+
+    def _load_template(self, name, filename, stats, current):
+        """_Template for name, reusing current if none of its files changed"""
+        layout_filename = name + LAYOUT_EXTENSION
+        files = (filename, stats[filename], stats.get(layout_filename))
+        if current is not None and current.files == files:
+            return current
+        try:
+            layout = Layout()
+            if layout_filename in stats:
+                layout = Layout.load(os.path.join(self.template_dir, layout_filename))
+            generator = CertificateGenerator(template_path=os.path.join(self.template_dir, filename),
+                                             layout=layout, **self.template_options)
+            if self.preload:
+                generator.get_template_version(check_file=False)
+        except Exception as e:
+            # Keep serving the last good version until the files are fixed
+            logger.error(f"❌ Cannot load template {name}: {e}")
+            return current
+        logger.info(f"🔄 Loaded template {name} ({filename}, layout: {layout_filename if files[2] else 'built-in'})")
+        return _Template(name, files, generator)
+
+    def _load_batches(self, stats, templates):
+        _, batches, default = self._state
+        if BATCHES_FILENAME not in stats:
+            batches, default = {}, None
+        else:
+            try:
+                with open(os.path.join(self.template_dir, BATCHES_FILENAME), 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+                batches, default = dict(config.get('batches', {})), config.get('default')
+            except (OSError, ValueError, AttributeError, TypeError) as e:
+                logger.error(f"❌ Cannot read {BATCHES_FILENAME}, keeping the previous mapping: {e}")
+
+        for name in sorted(set(batches.values()) - set(templates)):
+            logger.warning(f"⚠️ {BATCHES_FILENAME} maps batches to missing template {name}; they get the default")
+        if default not in templates:
+            default = DEFAULT_TEMPLATE if DEFAULT_TEMPLATE in templates else min(templates, default=None)
+        return batches, default
+
+    def refresh(self):
+        """Pick up added, changed and removed templates, layouts and batch mappings
+
+        Returns True if the directory changed since the last call.
+        """
+        with self._refresh_lock:
+            stats = self._scan()
+            if stats == self._stats:
+                return False
+
+            # One template file per name, by extension preference
+            files = {}
+            for ext in TEMPLATE_EXTENSIONS:
+                for filename in sorted(stats):
+                    name, file_ext = os.path.splitext(filename)
+                    if file_ext.lower() == ext and name not in files and \
+                            template_supported(os.path.join(self.template_dir, filename)):
+                        files[name] = filename
+
+            current_templates = self._state[0]
+            templates = {}
+            for name, filename in files.items():
+                template = self._load_template(name, filename, stats, current_templates.get(name))
+                if template is not None:
+                    templates[name] = template
+            for name in set(current_templates) - set(templates):
+                logger.info(f"🔄 Template removed: {name}")
+
+            batches, default = self._load_batches(stats, templates)
+            self._state = (templates, batches, default)
+            self._stats = stats
+            if not templates:
+                logger.error(f"❌ No certificate templates in {self.template_dir}")
+            return True
+
+    def snapshot(self):
+        """Picklable copy of the loaded templates (path, layout and file stats), batch mapping and default
+
+        Equal snapshots describe the same template files and layouts.
+        """
+        templates, batches, default = self._state
+        return ({name: (template.generator.template_path, template.generator.layout.definition, template.files)
+                 for name, template in templates.items()}, dict(batches), default)
+
+    def _load_snapshot(self, snapshot):
+        paths, batches, default = snapshot
+        templates = {}
+        for name, (template_path, definition, files) in paths.items():
+            generator = CertificateGenerator(template_path=template_path, layout=Layout(definition),
+                                             **self.template_options)
+            templates[name] = _Template(name, files, generator)
+        self._state = (templates, batches, default)
+
+    def start_watching(self, interval=RELOAD_INTERVAL):
+        """Call refresh() every interval seconds from a daemon thread"""
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"❌ Template refresh failed: {e}")
+
+        self._watcher = threading.Thread(target=watch, name='template-watcher', daemon=True)
+        self._watcher.start()
+
+    def _template_for(self, batch_number):
+        templates, batches, default = self._state
+        return templates.get(batches.get(batch_number)) or templates.get(default)
+
+    def template_name(self, batch_number):
+        """Name of the template batch_number's certificates use, or None"""
+        template = self._template_for(batch_number)
+        return template.name if template else None
+
+    def generator_for_batch(self, batch_number):
+        """CertificateGenerator of batch_number's template, or None if there are no templates"""
+        template = self._template_for(batch_number)
+        return template.generator if template else None
+
+    def get_template_version(self, student):
+        """Identifies the template and layout the student's certificate is drawn with"""
+        template = self._template_for(student['batch_number'])
+        if template is None:
+            return None
+        version = template.generator.get_template_version(check_file=False)
+        return f"{template.name}-{version}-{template.generator.layout.digest}"
+
+    def create_certificate(self, student_data, output_path, issue_date=None):
+        generator = self.generator_for_batch(student_data['batch_number'])
+        if generator is None:
+            logger.error("❌ No template available")
+            return False
+        return generator.create_certificate(student_data, output_path, issue_date=issue_date)
+
+    def render_certificate(self, student_data, issue_date=None):
+        generator = self.generator_for_batch(student_data['batch_number'])
+        if generator is None:
+            logger.error("❌ No template available")
+            return None
+        return generator.render_certificate(student_data, issue_date=issue_date)
+
+    def evict_batch_layers(self, batch_numbers=None):
+        """CertificateGenerator.evict_batch_layers on every template"""
+        for template in self._state[0].values():
+            template.generator.evict_batch_layers(batch_numbers)
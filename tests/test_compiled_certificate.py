@@ -0,0 +1,88 @@
+import os
+import re
+import sys
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from pdfrw import PdfReader
+from reportlab.pdfgen import canvas
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from certificate_generator import CertificateGenerator
+from compiled_certificate import CompiledCertificate
+
+
+STUDENT = {
+    'student_name': "Anna (O'Brien) \\ Müller",
+    'batch_number': 'AWS-2024-001',
+    'batch_start_date': '2024-01-15',
+    'batch_end_date': '2024-04-15',
+    'sixerclass_id': 'SIX001'
+}
+
+
+def skeleton(fonts=('Helvetica', 'Helvetica-Bold')):
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(400, 300), invariant=1)
+    c.rect(10, 10, 380, 280)
+    font_names = {font: c._doc.getInternalFontName(font)[1:] for font in fonts}
+    c.showPage()
+    c.save()
+    return buffer.getvalue(), font_names
+
+
+def assert_valid_xref(data):
+    startxref = int(data[data.rindex(b'startxref') + 9:].split()[0])
+    assert data[startxref:startxref + 4] == b'xref'
+    count = int(re.match(rb'xref\s+0 (\d+)', data[startxref:]).group(1))
+    offsets = [int(offset) for offset in re.findall(rb'(\d{10}) \d{5} n', data[startxref:])]
+    assert len(offsets) == count - 1
+    for number, offset in enumerate(offsets, start=1):
+        assert data.startswith(b'%d 0 obj' % number, offset), f"object {number} not at {offset}"
+    assert re.search(rb'/Size %d\b' % count, data[startxref:])
+
+
+def test_render_offsets_and_parse():
+    data, font_names = skeleton()
+    compiled = CompiledCertificate(data, font_names)
+    layer = compiled.text_ops([('Helvetica', 12, 50, 50, 'Batch: AWS-2024-001')])
+    pdf = compiled.render([('Helvetica-Bold', 32, 100.5, 200, STUDENT['student_name'])], layers=(layer,))
+
+    assert_valid_xref(pdf)
+    page = PdfReader(fdata=pdf).pages[0]
+    assert len(page.Contents) == 2
+    text = page.Contents[1].stream
+    assert 'Batch: AWS-2024-001' in text
+    assert "(Anna \\(O'Brien\\) \\\\ M" in text
+
+
+def test_renders_are_independent():
+    data, font_names = skeleton()
+    compiled = CompiledCertificate(data, font_names)
+    first = compiled.render([('Helvetica', 10, 0, 0, 'first')])
+    second = compiled.render([('Helvetica', 10, 0, 0, 'a much longer second text')])
+    assert_valid_xref(first)
+    assert_valid_xref(second)
+    assert b'first' not in second
+
+
+def test_text_outside_winansi_is_rejected():
+    data, font_names = skeleton()
+    compiled = CompiledCertificate(data, font_names)
+    with pytest.raises(UnicodeEncodeError):
+        compiled.render([('Helvetica', 10, 0, 0, 'Łukasz')])
+
+
+def test_generator_output(tmp_path):
+    template_path = str(tmp_path / 'certificate-template.png')
+    Image.new('RGB', (320, 240), 'white').save(template_path)
+    generator = CertificateGenerator(template_path=template_path)
+
+    pdf = generator.render_certificate(STUDENT, issue_date='2024-05-01')
+    assert_valid_xref(pdf)
+    page = PdfReader(fdata=pdf).pages[0]
+    text = ''.join(contents.stream for contents in page.Contents)
+    assert '01-05-2024' in text
+    assert 'SIX001' in text
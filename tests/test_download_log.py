@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from download_log import DownloadLog
+
+
+def event(i):
+    return {
+        'student_name': f'Student {i}',
+        'sixerclass_id': f'SIX{i:03d}',
+        'batch_number': 'AWS-2024-001',
+        'download_time': f'2024-05-01T10:00:{i % 60:02d}'
+    }
+
+
+def test_replay_across_segment_size_change(tmp_path):
+    log = DownloadLog(str(tmp_path), segment_size=200)
+    for i in range(20):
+        log.append(event(i))
+    log.close()
+    assert len(log._segments()) > 2
+
+    # Reopened with a larger segment size: every segment is still replayed
+    log = DownloadLog(str(tmp_path))
+    assert log.stats.total_downloads == 20
+
+    # and later appends are counted
+    log.append(event(20))
+    assert log.stats.total_downloads == 21
+    log.close()
+
+
+def test_other_worker_appends_after_rotation(tmp_path):
+    reader = DownloadLog(str(tmp_path), segment_size=200)
+    writer = DownloadLog(str(tmp_path), segment_size=8 * 1024 * 1024)
+    for i in range(10):
+        reader.append(event(i))
+    # The writer has a larger segment size but still appends to the newest segment
+    writer.append(event(10))
+    reader.refresh()
+    assert reader.stats.total_downloads == 11
+    assert sum(1 for _ in reader.iter_events()) == 11
+    reader.close()
+    writer.close()
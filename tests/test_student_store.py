@@ -0,0 +1,139 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from student_store import StudentStore, SORT_FIELDS
+from student_storage import SQLiteStudentBackend
+
+NAMES = ['Rahul Sharma', 'Priya Patel', 'Amit Kumar', 'Neha Gupta', 'Vikram Singh', 'Anjali Sharma', 'Ravi Kumar']
+
+
+def student(i, name=None, sid=None, batch=None):
+    return {
+        'student_name': name or f'{NAMES[i % len(NAMES)]} {i // len(NAMES)}',
+        'batch_number': batch or f'AWS-2024-{i % 4:03d}',
+        'batch_start_date': f'2024-0{i % 9 + 1}-01',
+        'batch_end_date': f'2024-0{i % 9 + 1}-28',
+        'sixerclass_id': sid or f'SIX{i:04d}'
+    }
+
+
+def brute_force(store, query):
+    query = query.lower()
+    return [s for s in store.all()
+            if any(query in s[field].lower() for field in ('student_name', 'batch_number', 'sixerclass_id'))]
+
+
+@pytest.fixture
+def store():
+    random.seed(7)
+    store = StudentStore([student(i) for i in range(300)])
+    # Removed and changed students leave dead rows in the search index
+    store.build_search_index()
+    for i in random.sample(range(300), 60):
+        store.delete(f'SIX{i:04d}')
+    for sid in random.sample([s['sixerclass_id'] for s in store.all()], 30):
+        store.update(sid, student(int(sid[3:]) + 1000, name=f'Zoë {sid}'))
+    store.add_many([student(i) for i in range(300, 340)])
+    return store
+
+
+@pytest.mark.parametrize('query', ['a', 'Z', 'ë', '1', 'sh', 'ZO', '-0', 'six00', 'Kumar', 'patel 3',
+                                   'AWS-2024-002', 'SIX1', 'zoë six0', 'not there', 'a\x00'])
+def test_search_matches_substring_scan(store, query):
+    total, page = store.page(search=query)
+    expected = brute_force(store, query)
+    assert page == expected
+    assert total == len(expected)
+
+
+@pytest.mark.parametrize('field', SORT_FIELDS)
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('search', [None, 'sharma', 'a'])
+def test_cursor_pages_join_up(store, field, descending, search):
+    total, everything = store.page(sort=field, descending=descending, search=search)
+    assert len(everything) == total
+
+    seen = []
+    after = None
+    while True:
+        _, page = store.page(sort=field, descending=descending, after=after, limit=7, search=search)
+        if not page:
+            break
+        seen.extend(page)
+        after = StudentStore.sort_key(page[-1], field)
+
+    assert seen == everything
+    assert len({s['sixerclass_id'] for s in seen}) == len(seen)
+    keys = [StudentStore.sort_key(s, field) for s in seen]
+    assert keys == sorted(keys, reverse=descending)
+
+
+def test_offset_pages(store):
+    _, everything = store.page(sort='student_name')
+    pages = [store.page(sort='student_name', offset=offset, limit=25)[1] for offset in range(0, len(everything), 25)]
+    assert [s for page in pages for s in page] == everything
+
+
+@pytest.fixture
+def stores(tmp_path):
+    db_path = str(tmp_path / 'students.db')
+    stores = [StudentStore(backend=SQLiteStudentBackend(db_path)) for _ in range(2)]
+    for s in stores:
+        s.sync()
+    yield stores
+    for s in stores:
+        s.backend.close()
+
+
+def assert_same(a, b):
+    assert b.all() == a.all()
+    for s in a.all():
+        assert b.find(s['student_name'], s['batch_number'], s['sixerclass_id']) == s
+    assert sorted(b.batch_numbers()) == sorted(a.batch_numbers())
+    for query in ('sharma', 'six', 'x'):
+        assert b.page(search=query) == a.page(search=query)
+
+
+def test_two_stores_stay_in_sync(stores):
+    a, b = stores
+    a.add_many([student(i) for i in range(10)])
+    b.sync()
+    assert_same(a, b)
+
+    a.update('SIX0003', student(3, name='Renamed Student'))
+    a.update('SIX0005', student(5, sid='NEW0005'))
+    a.update('NEW0005', student(5, sid='NEWER0005', batch='AWS-2025-001'))
+    a.delete('SIX0007')
+    b.add(student(20))
+    a.sync()
+    b.sync()
+    assert_same(a, b)
+    # The student whose ID changed twice kept its place
+    assert [s['sixerclass_id'] for s in b.all()][5] == 'NEWER0005'
+    assert b.get('SIX0005') is None and b.get('NEW0005') is None
+
+    # Swap two IDs through a temporary one
+    b.update('SIX0000', student(0, sid='TMP'))
+    b.update('SIX0001', student(1, sid='SIX0000'))
+    b.update('TMP', student(0, sid='SIX0001'))
+    a.sync()
+    assert_same(b, a)
+
+
+def test_stale_store_reports_duplicates(stores):
+    a, b = stores
+    a.add_many([student(i) for i in range(3)])
+    added, duplicates = b.add_many([student(2), student(3)])
+    assert [s['sixerclass_id'] for s in added] == ['SIX0003']
+    assert [s['sixerclass_id'] for s in duplicates] == ['SIX0002']
+    a.sync()
+    assert_same(a, b)
+
+    a.add(student(4))
+    assert b.update('SIX0000', student(0, sid='SIX0004')) is False
+    assert_same(a, b)